@@ -0,0 +1,43 @@
+"""Case-insensitive covering email index
+
+Replaces ix_users_id (redundant with the primary key) and the case-sensitive
+ix_users_email with a unique index on lower(email) that INCLUDEs the columns
+the auth lookups read. Fails if existing emails differ only by case; merge
+those accounts first.
+
+Revision ID: b4d2f81c6e07
+Revises: 7c1e4b9a2d3f
+Create Date: 2026-10-19 14:37:05.661920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d2f81c6e07'
+down_revision: Union[str, Sequence[str], None] = '7c1e4b9a2d3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_users_email_lower',
+        'users',
+        [sa.text('lower(email)')],
+        unique=True,
+        postgresql_include=['id', 'email', 'hashed_password', 'is_active', 'auth_method'],
+    )
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.drop_index('ix_users_email_lower', table_name='users')
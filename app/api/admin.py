@@ -0,0 +1,33 @@
+import json
+from typing import Iterator
+from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.core.dependencies import get_admin_user, get_db
+from app.core.provisioning import ImportFormat, detect_format, import_users
+
+router = APIRouter()
+
+@router.post("/users/import", summary="Bulk-create Basic Auth users from CSV or NDJSON")
+def import_users_endpoint(
+    file: UploadFile = File(...),
+    format: ImportFormat | None = None, # Guessed from the filename/content type if omitted
+    db: Session = Depends(get_db),
+    admin_user = Depends(get_admin_user), # Admins only
+):
+    """
+    Imports users (CSV with an `email,password` header, or one JSON object per
+    line) and streams NDJSON back: one result per row, a progress line per
+    batch of 1000 and a final summary. Existing emails are skipped, not updated.
+    Files over MAX_IMPORT_UPLOAD_MB are rejected (413).
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+
+    def ndjson_lines() -> Iterator[str]:
+        # Sync generator: Starlette runs it in the threadpool, so hashing and
+        # inserts never block the event loop
+        for result in import_users(db, file.file, fmt):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
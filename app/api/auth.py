@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import RedirectResponse
 from fastapi.security import HTTPBasicCredentials
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from starlette.concurrency import run_in_threadpool
+import redis.asyncio as redis
 
 # For Basic Auth
-from app.core.dependencies import get_db
-from app.core.security import verify_password, create_access_token, get_password_hash
+from app.core.dependencies import get_db, get_redis_client, get_token_payload
+from app.core.security import verify_password, get_password_hash
 from app.schemas.user import UserCreate
-from app.schemas.token import Token
-from app.db.models import User
+from app.schemas.token import RefreshRequest, Token
+from app.db.queries import create_basic_user, get_auth_user, get_or_create_sso_user
 
-# For Google SSO
-from fastapi_sso.sso.google import GoogleSSO
+# Sessions: rotating refresh tokens and revocation (see app/core/sessions.py)
+from app.core.sessions import InvalidRefreshToken, refresh_session, revoke_session, start_session
+
+# For Google SSO (own OpenID Connect client, see app/core/oauth.py)
+from functools import lru_cache
+from app.core import oauth
 from app.core.config import settings
 
 # Fast API + redis limmiter 
@@ -19,13 +25,17 @@ from fastapi_limiter.depends import RateLimiter
 
 router = APIRouter()
 
-# Initialize Google SSO
-sso = GoogleSSO(
-    settings.GOOGLE_CLIENT_ID, 
-    settings.GOOGLE_CLIENT_SECRET, 
-    settings.REDIRECT_URI, 
-    allow_insecure_http=True # Use False in production with HTTPS
-)
+# Initialize Google SSO on first use rather than at import time
+@lru_cache(maxsize=1)
+def get_google_provider() -> oauth.OIDCProvider:
+    """Returns the shared Google OpenID Connect client (keeps its discovery/JWKS caches)."""
+    return oauth.OIDCProvider(
+        settings.GOOGLE_DISCOVERY_URL,
+        settings.GOOGLE_CLIENT_ID,
+        settings.GOOGLE_CLIENT_SECRET,
+        settings.REDIRECT_URI,
+        cache_ttl=settings.OAUTH_CACHE_TTL_SECONDS,
+    )
 
 # --- Basic Auth Endpoints ---
 # Applied Limiter to registration endpoint as Allow only 5 registrations per 10 seconds per IP
@@ -41,78 +51,113 @@ def register_user(
     db: Session = Depends(get_db)
 ):
     """Creates a new user for Basic Authentication."""
-    db_user = db.query(User).filter(User.email == user_data.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-        
     hashed_password = get_password_hash(user_data.password)
-    new_user = User(
-        email=user_data.email, 
-        hashed_password=hashed_password, 
-        auth_method="Basic"
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # Single INSERT .. ON CONFLICT DO NOTHING: no SELECT first, and no race
+    # between two registrations of the same (case-insensitive) email
+    if not create_basic_user(db, user_data.email, hashed_password):
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"message": "User registered successfully."}
 
 @router.post("/basic/token", response_model=Token)
-def basic_auth_login_for_access_token(
+async def basic_auth_login_for_access_token(
     form_data: HTTPBasicCredentials = Depends(), 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    redis_client: redis.Redis = Depends(get_redis_client),
 ):
-    """Exchanges username/password for a JWT token."""
-    user = db.query(User).filter(User.email == form_data.username).first()
-    
-    if not user or not user.hashed_password or not verify_password(form_data.password, user.hashed_password):
+    """Exchanges username/password for an access token and a refresh token."""
+    def authenticate():
+        # Blocking DB query and Argon2 verify stay off the event loop
+        user = get_auth_user(db, form_data.username)
+        if not user or not user.hashed_password or not verify_password(form_data.password, user.hashed_password):
+            return None
+        return user
+
+    user = await run_in_threadpool(authenticate)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await start_session(redis_client, user.email)
+
+# --- Session Endpoints ---
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(
+    body: RefreshRequest,
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    """Exchanges a refresh token for a new access/refresh token pair (the old refresh token stops working)."""
+    try:
+        return await refresh_session(redis_client, body.refresh_token)
+    except InvalidRefreshToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+# Protected
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    payload: dict = Depends(get_token_payload),
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    """Ends the current session: its refresh token and all of its access tokens stop working."""
+    # Tokens issued before sessions existed have no sid; they simply expire
+    if payload.get("sid"):
+        await revoke_session(redis_client, payload["sid"])
 
 # --- Google SSO Endpoints ---
 
 @router.get("/google/login")
 async def google_login():
     """Redirects to Google's login page."""
-    return await sso.get_login_redirect()
+    try:
+        state, nonce, cookie = oauth.new_login_state()
+        login_url = await get_google_provider().authorization_url(state, nonce)
+    except oauth.OAuthError as e:
+        print(f"SSO Error: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Google SSO is unavailable.")
+
+    response = RedirectResponse(login_url)
+    # State (CSRF) and nonce (ID token replay) come back to the callback in this cookie
+    response.set_cookie(
+        oauth.STATE_COOKIE,
+        cookie,
+        max_age=oauth.STATE_COOKIE_MAX_AGE,
+        httponly=True,
+        samesite="lax",
+        secure=settings.REDIRECT_URI.startswith("https://"),
+    )
+    return response
 
 @router.get("/google/callback", response_model=Token)
-async def google_callback(request: Request, db: Session = Depends(get_db)):
+async def google_callback(
+    request: Request,
+    response: Response,
+    code: str | None = None,
+    state: str | None = None,
+    db: Session = Depends(get_db),
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
     """Handles the callback from Google, authenticates, and returns JWT."""
+    response.delete_cookie(oauth.STATE_COOKIE)
     try:
-        # Verify and process the login via Google
-        user_info = await sso.verify_and_process(request)
-        user_email = user_info.email
-        
-        db_user = db.query(User).filter(User.email == user_email).first()
+        # Exchange the code and verify the ID token locally against Google's cached keys
+        if not code:
+            raise oauth.OAuthError(f"No authorization code ({request.query_params.get('error', 'unknown error')}).")
+        nonce = oauth.check_login_state(request.cookies.get(oauth.STATE_COOKIE), state)
+        claims = await get_google_provider().authenticate(code, nonce)
+        user_email = claims["email"]
         
-        # 1. Register or Retrieve User
-        if not db_user:
-            new_user = User(
-                email=user_email, 
-                auth_method="SSO", 
-                hashed_password=None
-            )
-            db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
-            db_user = new_user
-
-        # 2. Generate JWT
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": db_user.email}, expires_delta=access_token_expires
-        )
-        
-        return {"access_token": access_token, "token_type": "bearer"}
+        # 1. Register or Retrieve User (blocking DB calls stay off the event loop)
+        db_user = await run_in_threadpool(get_or_create_sso_user, db, user_email)
+
+        # 2. Start a session (access + refresh token)
+        return await start_session(redis_client, db_user.email)
 
     except Exception as e:
         # Log the error for debugging
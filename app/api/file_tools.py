@@ -1,25 +1,45 @@
 import base64
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from app.core.dependencies import get_current_user
+import itertools
+import json
+from typing import Iterator, Literal
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.dependencies import get_current_user, get_usage_meter
+from app.core.config import settings
+from app.core.uploads import MB, SpooledUpload, spool_upload
+from app.core.usage import UsageMeter
+from app.core.hashing import SUPPORTED_ALGORITHMS, MultipartHasher, parse_algorithms
+from python_multipart.multipart import parse_options_header
+from app.core.compression import (
+    EXTENSIONS,
+    MEDIA_TYPES,
+    PARALLEL_GZIP_MIN_BYTES,
+    base64_chunks,
+    compress_chunks,
+    decompress_chunks,
+    parallel_gzip_chunks,
+    resolve_level,
+    zip_chunks,
+)
 
 router = APIRouter()
 
+# /hash body chunks at least this large are hashed in a worker thread
+HASH_THREAD_BYTES = 64 * 1024
+
 # Schema for Base64 input (assuming you add it to app/schemas/file.py)
 # class Base64In(BaseModel):
 #     base64_string: str
 #     filename: str
 
-@router.post("/to-base64", summary="Convert file to Base64")
-async def file_to_base64_endpoint(
-    file: UploadFile = File(...), 
-    current_user: str = Depends(get_current_user) # Protected
-):
-    """Accepts any file and returns its Base64 encoded string."""
-    contents = await file.read()
-    encoded_string = base64.b64encode(contents).decode('utf-8')
-    
+def base64_payload(upload: SpooledUpload, current_user) -> dict:
+    """Builds the /to-base64 response body (shared with the resumable upload finalizer)."""
+    # Encode straight from the spooled upload (mmap/memoryview), no bytes copy
+    encoded_string = base64.b64encode(upload.view()).decode('utf-8')
+
     return {
-        "filename": file.filename, 
+        "filename": upload.filename, 
         "base64_string": encoded_string,
         "user": {
             "email": current_user.email,
@@ -29,12 +49,25 @@ async def file_to_base64_endpoint(
         }
     }
 
+@router.post("/to-base64", summary="Convert file to Base64")
+async def file_to_base64_endpoint(
+    file: UploadFile = File(...), 
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    """Accepts any file and returns its Base64 encoded string."""
+    await usage.charge(file.size or 0)
+    with await spool_upload(file, settings.MAX_FILE_UPLOAD_MB * MB) as upload:
+        return base64_payload(upload, current_user)
+
 @router.post("/from-base64", summary="Convert Base64 string to raw file bytes")
 async def base64_to_file_endpoint(
     data: dict, # Using dict for simplicity, use a Pydantic model for production
-    current_user: str = Depends(get_current_user) # Protected
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
 ):
     """Accepts a Base64 string and returns the decoded bytes (for saving or direct use)."""
+    await usage.charge(len(data.get("base64_string") or ""))
     try:
         base64_string = data.get("base64_string")
         if not base64_string:
@@ -48,4 +81,178 @@ async def base64_to_file_endpoint(
             # In a real app, you might return the bytes in a StreamingResponse
         }
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid Base64 string: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Invalid Base64 string: {e}")
+
+# The body is parsed by hand, so describe the expected form for the docs
+HASH_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                "required": ["files"],
+            }
+        }
+    },
+}
+
+@router.post("/hash", summary="Compute several checksums of one or more files", openapi_extra={"requestBody": HASH_REQUEST_BODY})
+async def hash_files_endpoint(
+    request: Request,
+    algorithms: str = ",".join(SUPPORTED_ALGORITHMS),
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    """
+    Hashes each file in a single streaming pass with all requested algorithms
+    (sha256, sha1, md5, blake2b, crc32) and returns NDJSON: one line per file,
+    written as soon as that file is done.
+
+    The multipart body is parsed as it arrives and fed to the hashers directly;
+    it is never spooled to disk, so files up to MAX_HASH_UPLOAD_MB cost no
+    temp space. The body must declare its Content-Length (411 otherwise).
+    """
+    try:
+        selected = parse_algorithms(algorithms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body with `files` parts.")
+    # Usage is charged up front from the declared length; a chunked body would go unmetered
+    content_length = request.headers.get("content-length", "")
+    if not content_length.isdigit():
+        raise HTTPException(status_code=status.HTTP_411_LENGTH_REQUIRED, detail="Content-Length is required.")
+    await usage.charge(int(content_length))
+
+    hasher = MultipartHasher(options[b"boundary"], selected)
+    body = request.stream().__aiter__()
+    pending: list[dict] = []
+
+    async def feed(chunk: bytes) -> list[dict]:
+        # Hash in a worker thread: hashlib releases the GIL on large chunks
+        return await run_in_threadpool(hasher.write, chunk) if len(chunk) >= HASH_THREAD_BYTES else hasher.write(chunk)
+
+    # Read up to the first file part before answering, so an empty form is still a 400
+    body_done = False
+    while not hasher.files_started:
+        try:
+            pending += await feed(await body.__anext__())
+        except StopAsyncIteration:
+            body_done = True
+            break
+    if not hasher.files_started:
+        raise HTTPException(status_code=400, detail="No files uploaded.")
+
+    async def ndjson_lines():
+        for result in pending:
+            yield json.dumps(result) + "\n"
+        if not body_done:
+            async for chunk in body:
+                for result in await feed(chunk):
+                    yield json.dumps(result) + "\n"
+        for result in hasher.finish():
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+# --- Compression tools ---
+# The generators below run in Starlette's threadpool while the response streams,
+# so compression never blocks the event loop and memory stays flat.
+
+CompressionFormat = Literal["gzip", "zlib", "bz2", "lzma"]
+CompressionPreset = Literal["fast", "balanced", "best"]
+OutputEncoding = Literal["none", "base64"]
+
+def _streamed(upload: SpooledUpload, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Closes the spooled upload once the response has been fully streamed."""
+    try:
+        yield from chunks
+    finally:
+        upload.close()
+
+def _encoded_response(chunks: Iterator[bytes], media_type: str, filename: str, encode: str) -> StreamingResponse:
+    if encode == "base64":
+        chunks, media_type, filename = base64_chunks(chunks), "text/plain", f"{filename}.b64"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@router.post("/compress", summary="Compress a file (gzip, zlib, bz2, lzma)")
+async def compress_file_endpoint(
+    file: UploadFile = File(...),
+    format: CompressionFormat = "gzip",
+    preset: CompressionPreset = "balanced",
+    level: int | None = None, # Overrides the preset
+    parallel: bool = True, # Block-parallel gzip for large inputs
+    encode: OutputEncoding = "none", # "base64" = compress-then-encode in one call
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    """Streams the compressed file back, optionally Base64 encoded."""
+    try:
+        resolved_level = resolve_level(format, level, preset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await usage.charge(file.size or 0)
+    upload = await spool_upload(file, settings.MAX_FILE_UPLOAD_MB * MB)
+    if format == "gzip" and parallel and upload.size >= PARALLEL_GZIP_MIN_BYTES:
+        chunks = parallel_gzip_chunks(upload.open(), resolved_level)
+    else:
+        chunks = compress_chunks(upload.open(), format, resolved_level)
+
+    return _encoded_response(
+        _streamed(upload, chunks), MEDIA_TYPES[format], f"{file.filename}{EXTENSIONS[format]}", encode
+    )
+
+@router.post("/decompress", summary="Decompress a gzip, zlib, bz2 or lzma file")
+async def decompress_file_endpoint(
+    file: UploadFile = File(...),
+    format: CompressionFormat = "gzip",
+    encode: OutputEncoding = "none",
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    """Streams the decompressed file back, optionally Base64 encoded."""
+    await usage.charge(file.size or 0)
+    upload = await spool_upload(file, settings.MAX_FILE_UPLOAD_MB * MB)
+    chunks = decompress_chunks(upload.open(), format, max_output=settings.MAX_DECOMPRESSED_MB * MB)
+
+    # Fail with a proper 400 if the input is not valid `format` data at all;
+    # errors further into the stream can only abort the response.
+    try:
+        first = await run_in_threadpool(next, chunks, b"")
+    except ValueError as e:
+        upload.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = file.filename or "file"
+    if filename.endswith(EXTENSIONS[format]):
+        filename = filename[: -len(EXTENSIONS[format])]
+    return _encoded_response(
+        _streamed(upload, itertools.chain([first], chunks)), "application/octet-stream", filename, encode
+    )
+
+@router.post("/zip", summary="Create a ZIP archive from several files")
+async def zip_files_endpoint(
+    files: list[UploadFile] = File(...),
+    preset: CompressionPreset = "balanced",
+    level: int | None = None,
+    encode: OutputEncoding = "none",
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    """Streams a ZIP archive of all uploaded files."""
+    try:
+        resolved_level = resolve_level("zip", level, preset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await usage.charge(sum(file.size or 0 for file in files))
+    # Multipart parts are already spooled by Starlette; stream straight from them
+    entries = [(file.filename or "file", file.file, file.size or 0) for file in files]
+    return _encoded_response(zip_chunks(entries, resolved_level), "application/zip", "archive.zip", encode)
@@ -1,72 +1,199 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from fastapi.responses import StreamingResponse
-from PIL import Image
+import hashlib
+import math
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, status
+from fastapi.responses import Response
 from io import BytesIO
-from app.core.dependencies import get_current_user
+from typing import BinaryIO, Callable
+from starlette.concurrency import run_in_threadpool
+from app.core.dependencies import get_current_user, get_usage_meter
+from app.core.config import settings
+from app.core.frames import is_multi_frame, save_frames
+from app.core.image_workers import run_in_image_process
+from app.core.singleflight import SingleFlight
+from app.core.uploads import MB, SpooledUpload, spool_upload
+from app.core.usage import MEGAPIXEL, UsageMeter
+
+# Pillow is imported inside the helpers: it is only needed once an image
+# request arrives, and keeping it out of module import speeds up app startup.
 
 router = APIRouter()
 
+IMAGE_CONTENT_TYPES = ["image/jpeg", "image/png", "image/jpg", "image/gif", "image/webp", "image/tiff"]
+# Formats written back as-is; anything else is re-encoded as JPEG
+OUTPUT_FORMATS = ['JPEG', 'PNG', 'GIF', 'WEBP', 'TIFF']
+# Bounds on the requested output size (usage is charged for it before Pillow runs)
+MAX_OUTPUT_DIMENSION = 16384
+MAX_SCALE_FACTOR = 16.0
+
+# Identical uploads with identical parameters (e.g. a popular image shared by
+# many clients) are decoded and encoded once; duplicates share the result.
+resize_flight = SingleFlight("image_resize")
+upscale_flight = SingleFlight("image_upscale")
+
+def ensure_image_content_type(content_type: str | None) -> None:
+    if content_type not in IMAGE_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid image format.")
+
+# --- Image operations (shared with the resumable upload finalizers) ---
+
+def resize_image(
+    upload: SpooledUpload, width: int, height: int, quality: int, frame_step: int = 1, out: BinaryIO | None = None
+) -> BinaryIO:
+    """Resizes the uploaded image and returns the encoded result (written to `out` if given)."""
+    from PIL import Image
+
+    # Pillow decodes straight from the spooled upload (mmap/BytesIO), no extra copy
+    image = Image.open(upload.open())
+    img_byte_arr = out if out is not None else BytesIO()
+
+    if is_multi_frame(image):
+        # Animated GIF/WebP, multi-page TIFF: frame by frame, keeping every `frame_step`-th frame
+        save_frames(image, lambda frame: frame.resize((width, height)), img_byte_arr, frame_step, quality)
+        img_byte_arr.seek(0)
+        return img_byte_arr
+
+    resized_image = image.resize((width, height))
+    img_format = image.format if image.format in OUTPUT_FORMATS else 'JPEG'
+
+    # Use quality only for lossy formats to reduce file size (memory)
+    if img_format in ('JPEG', 'WEBP'):
+        resized_image.save(img_byte_arr, format=img_format, quality=quality)
+    else: # PNG/GIF/TIFF (for transparency)
+        resized_image.save(img_byte_arr, format=img_format)
+
+    img_byte_arr.seek(0)
+    return img_byte_arr
+
+def upscale_image(upload: SpooledUpload, scale_factor: float, frame_step: int = 1, out: BinaryIO | None = None) -> BinaryIO:
+    """Scales the uploaded image by `scale_factor` and returns the encoded result (written to `out` if given)."""
+    # Basic implementation using resize. Real upscaling is much more complex (ML models).
+    from PIL import Image
+
+    image = Image.open(upload.open())
+    new_width = int(image.width * scale_factor)
+    new_height = int(image.height * scale_factor)
+    img_byte_arr = out if out is not None else BytesIO()
+
+    if is_multi_frame(image):
+        save_frames(image, lambda frame: frame.resize((new_width, new_height), resample=Image.BICUBIC), img_byte_arr, frame_step)
+        img_byte_arr.seek(0)
+        return img_byte_arr
+
+    upscaled_image = image.resize((new_width, new_height), resample=Image.BICUBIC)
+
+    upscaled_image.save(img_byte_arr, format=image.format or 'JPEG')
+    img_byte_arr.seek(0)
+    return img_byte_arr
+
+def image_response(content: bytes, media_type: str, filename: str) -> Response:
+    return Response(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+def probe_image(upload: SpooledUpload) -> tuple[int, int, int]:
+    """(width, height, frames) from the image headers; pixel data is not decoded."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(upload.open()) as image:
+            return image.width, image.height, getattr(image, "n_frames", 1)
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="Invalid image file.")
+
+async def charge_image_usage(
+    usage: UsageMeter,
+    upload: SpooledUpload,
+    frame_step: int,
+    size: tuple[int, int] | None = None,
+    scale_factor: float = 1.0,
+) -> int:
+    """
+    Charges the upload's bytes and the output's pixels (`size`, or the input
+    scaled by `scale_factor`). Returns the output pixel count; outputs over
+    MAX_OUTPUT_MEGAPIXELS are rejected (400) before anything is charged.
+    """
+    width, height, frames = await run_in_threadpool(probe_image, upload)
+    if size is None:
+        size = (int(width * scale_factor), int(height * scale_factor))
+    pixels = size[0] * size[1] * math.ceil(frames / frame_step)
+    if pixels > settings.MAX_OUTPUT_MEGAPIXELS * MEGAPIXEL:
+        raise HTTPException(
+            status_code=400, detail=f"Output would exceed {settings.MAX_OUTPUT_MEGAPIXELS} megapixels."
+        )
+    await usage.charge(upload.size, pixels)
+    return pixels
+
+async def run_image_operation(operation: Callable, upload: SpooledUpload, output_pixels: int, *args) -> bytes:
+    """
+    Runs `resize_image`/`upscale_image` and returns the encoded bytes: in an
+    image process (IMAGE_PROCESS_WORKERS > 0, data passed through shared
+    memory) or in a worker thread.
+    """
+    if settings.IMAGE_PROCESS_WORKERS > 0:
+        # Encoded output stays below the raw RGBA size (plus container overhead); past
+        # IMAGE_SHM_MAX_OUTPUT_MB the rare larger result spills through the pipe instead
+        capacity = min(output_pixels * 4 + 64 * 1024, settings.IMAGE_SHM_MAX_OUTPUT_MB * MB)
+        return await run_in_image_process(operation, upload, capacity, *args)
+    img_byte_arr = await run_in_threadpool(operation, upload, *args)
+    return img_byte_arr.getvalue()
+
+def content_digest(upload: SpooledUpload) -> str:
+    """SHA-256 of the upload, used to key single-flight coalescing."""
+    return hashlib.sha256(upload.view()).hexdigest()
+
+# --- Endpoints ---
+
 @router.post("/resize", summary="Resize image by dimension and/or memory (quality)")
 async def resize_image_endpoint(
-    file: UploadFile = File(...), 
-    width: int = 400, 
-    height: int = 400, 
-    quality: int = 80, # 1 to 100, affects JPEG size
-    current_user: str = Depends(get_current_user) # Protected
+    file: UploadFile = File(...),
+    width: int = Query(400, gt=0, le=MAX_OUTPUT_DIMENSION),
+    height: int = Query(400, gt=0, le=MAX_OUTPUT_DIMENSION),
+    quality: int = 80, # 1 to 100, affects JPEG/WebP size
+    frame_step: int = Query(1, ge=1, description="Animated/multi-page images: keep every Nth frame"),
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
 ):
     """Resizes an image using specified dimensions and quality."""
-    if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
-        raise HTTPException(status_code=400, detail="Invalid image format.")
-    
-    try:
-        image = Image.open(BytesIO(await file.read()))
-        resized_image = image.resize((width, height))
-        
-        img_byte_arr = BytesIO()
-        img_format = image.format if image.format in ['JPEG', 'PNG'] else 'JPEG'
-
-        # Use quality only for JPEG to reduce file size (memory)
-        if img_format == 'JPEG':
-            resized_image.save(img_byte_arr, format=img_format, quality=quality)
-        else: # PNG (for transparency)
-            resized_image.save(img_byte_arr, format=img_format)
-            
-        img_byte_arr.seek(0)
-        
-        return StreamingResponse(
-            img_byte_arr, 
-            media_type=file.content_type,
-            headers={"Content-Disposition": f"attachment; filename=resized-{file.filename}"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Image processing failed: {e}")
+    ensure_image_content_type(file.content_type)
+
+    with await spool_upload(file, settings.MAX_IMAGE_UPLOAD_MB * MB) as upload:
+        pixels = await charge_image_usage(usage, upload, frame_step, size=(width, height))
+        digest = await run_in_threadpool(content_digest, upload)
+
+        async def work() -> bytes:
+            # Pillow runs off the event loop so concurrent duplicates can join this flight
+            return await run_image_operation(resize_image, upload, pixels, width, height, quality, frame_step)
+
+        try:
+            content = await resize_flight.do(f"{digest}:{file.content_type}:{width}x{height}:q{quality}:f{frame_step}", work)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Image processing failed: {e}")
+
+    return image_response(content, file.content_type, f"resized-{file.filename}")
 
 @router.post("/upscale", summary="Increase image dimensions (basic)")
 async def upscale_image_endpoint(
-    file: UploadFile = File(...), 
-    scale_factor: float = 2.0, # e.g., double the size
-    current_user: str = Depends(get_current_user) # Protected
+    file: UploadFile = File(...),
+    scale_factor: float = Query(2.0, gt=0, le=MAX_SCALE_FACTOR), # e.g., double the size
+    frame_step: int = Query(1, ge=1, description="Animated/multi-page images: keep every Nth frame"),
+    current_user: str = Depends(get_current_user), # Protected
+    usage: UsageMeter = Depends(get_usage_meter),
 ):
     """Increases image dimensions by a scale factor."""
-    # Basic implementation using resize. Real upscaling is much more complex (ML models).
-    if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
-        raise HTTPException(status_code=400, detail="Invalid image format.")
-        
-    try:
-        image = Image.open(BytesIO(await file.read()))
-        new_width = int(image.width * scale_factor)
-        new_height = int(image.height * scale_factor)
-        
-        upscaled_image = image.resize((new_width, new_height), resample=Image.BICUBIC)
-        
-        img_byte_arr = BytesIO()
-        upscaled_image.save(img_byte_arr, format=image.format or 'JPEG')
-        img_byte_arr.seek(0)
-        
-        return StreamingResponse(
-            img_byte_arr, 
-            media_type=file.content_type,
-            headers={"Content-Disposition": f"attachment; filename=upscaled-{file.filename}"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Image upscaling failed: {e}")
\ No newline at end of file
+    ensure_image_content_type(file.content_type)
+
+    with await spool_upload(file, settings.MAX_IMAGE_UPLOAD_MB * MB) as upload:
+        pixels = await charge_image_usage(usage, upload, frame_step, scale_factor=scale_factor)
+        digest = await run_in_threadpool(content_digest, upload)
+
+        async def work() -> bytes:
+            return await run_image_operation(upscale_image, upload, pixels, scale_factor, frame_step)
+
+        try:
+            content = await upscale_flight.do(f"{digest}:{file.content_type}:x{scale_factor}:f{frame_step}", work)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Image upscaling failed: {e}")
+
+    return image_response(content, file.content_type, f"upscaled-{file.filename}")
@@ -5,7 +5,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy.sql import text 
 import redis.asyncio as redis 
 
-from app.core.dependencies import get_db, get_redis_client
+from app.core.dependencies import get_admin_user, get_db, get_redis_client
+from app.core import metrics
 
 router = APIRouter()
 
@@ -45,4 +46,10 @@ async def check_health(
             detail={"message": "Critical services offline", "details": health_status}
         )
         
-    return {"message": "All critical services running", "details": health_status}
\ No newline at end of file
+    return {"message": "All critical services running", "details": health_status}
+
+# Protected: admins only (ADMIN_EMAILS), the counters reveal traffic and abuse patterns
+@router.get("/metrics", tags=["Monitoring"], dependencies=[Depends(get_admin_user)])
+async def get_metrics():
+    """Returns this worker's counters and gauges (e.g. coalesced image requests)."""
+    return metrics.snapshot()
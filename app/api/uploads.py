@@ -0,0 +1,177 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, Response, status
+import redis.asyncio as redis
+
+from app.api.file_tools import base64_payload
+from app.api.image_tools import (
+    MAX_OUTPUT_DIMENSION, MAX_SCALE_FACTOR, charge_image_usage, ensure_image_content_type, image_response, resize_image,
+    run_image_operation, upscale_image,
+)
+from app.core import resumable
+from app.core.config import settings
+from app.core.dependencies import get_current_user, get_redis_client, get_usage_meter
+from app.core.uploads import MB, SpooledUpload
+from app.core.usage import UsageMeter
+from app.schemas.upload import UploadCreate, UploadStatus
+
+# Resumable (tus-like) uploads for large files on unreliable networks:
+#   1. POST   /tools/uploads                -> create a session, get its id
+#   2. PATCH  /tools/uploads/{id}           -> append a chunk at Upload-Offset
+#   3. HEAD   /tools/uploads/{id}           -> ask for the current offset after a disconnect
+#   4. POST   /tools/uploads/{id}/<tool>    -> run a tool on the finished file
+router = APIRouter()
+
+# Upload ids are uuid4 hex strings; they also name the part file on disk
+UploadId = Annotated[str, Path(pattern=r"^[0-9a-f]{32}$")]
+
+def _offset_headers(session: dict) -> dict:
+    return {
+        "Upload-Offset": str(session["offset"]),
+        "Upload-Length": str(session["length"]),
+        "Cache-Control": "no-store",
+    }
+
+def _status(session: dict) -> UploadStatus:
+    return UploadStatus(
+        upload_id=session["upload_id"],
+        filename=session["filename"],
+        content_type=session["content_type"],
+        offset=session["offset"],
+        length=session["length"],
+        expires_in=session.get("expires_in", settings.UPLOAD_SESSION_TTL_SECONDS),
+    )
+
+@router.post("", status_code=status.HTTP_201_CREATED, response_model=UploadStatus, summary="Create a resumable upload")
+async def create_upload(
+    data: UploadCreate,
+    response: Response,
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    """Creates an upload session; send the file with PATCH requests to the returned id."""
+    session = await resumable.create_session(redis_client, str(current_user.id), data)
+    response.headers["Location"] = f"/tools/uploads/{session['upload_id']}"
+    response.headers.update(_offset_headers(session))
+    return _status(session)
+
+@router.head("/{upload_id}", summary="Get the current upload offset")
+async def upload_offset(
+    upload_id: UploadId,
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    """Returns the number of bytes received so far in the Upload-Offset header."""
+    session = await resumable.get_session(redis_client, upload_id, str(current_user.id))
+    return Response(status_code=status.HTTP_200_OK, headers=_offset_headers(session))
+
+@router.get("/{upload_id}", response_model=UploadStatus, summary="Get the upload status")
+async def upload_status(
+    upload_id: UploadId,
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    session = await resumable.get_session(redis_client, upload_id, str(current_user.id))
+    return _status(session)
+
+@router.patch("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Append a chunk")
+async def append_upload_chunk(
+    upload_id: UploadId,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    upload_checksum: str | None = Header(None, alias="Upload-Checksum"),
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    """
+    Streams the request body to disk at `Upload-Offset`.
+    An optional `Upload-Checksum: sha256|sha1|md5 <base64>` header is verified per chunk.
+    """
+    session = await resumable.get_session(redis_client, upload_id, str(current_user.id))
+    session["offset"] = await resumable.append_chunk(
+        redis_client, session, upload_offset, request.stream(), upload_checksum
+    )
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_offset_headers(session))
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Abort an upload")
+async def abort_upload(
+    upload_id: UploadId,
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+):
+    await resumable.get_session(redis_client, upload_id, str(current_user.id))
+    await resumable.delete_session(redis_client, upload_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# --- Finalizers: hand the completed file to an existing tool ---
+
+async def _completed_upload(redis_client: redis.Redis, upload_id: str, user_id: str, max_mb: int) -> SpooledUpload:
+    """Opens a finished upload from disk (mmap'd by the tools, never read into memory)."""
+    session = await resumable.get_session(redis_client, upload_id, user_id)
+    if session["offset"] != session["length"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: {session['offset']} of {session['length']} bytes received.",
+        )
+    if session["length"] > max_mb * MB:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds the {max_mb} MB limit for this tool.",
+        )
+    return SpooledUpload.from_path(resumable.part_path(upload_id), session["filename"], session["content_type"])
+
+@router.post("/{upload_id}/to-base64", summary="Convert a finished upload to Base64")
+async def finalize_to_base64(
+    upload_id: UploadId,
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    # The response is one JSON document built in memory: same cap as /tools/files/to-base64
+    upload = await _completed_upload(redis_client, upload_id, str(current_user.id), settings.MAX_FILE_UPLOAD_MB)
+    with upload:
+        await usage.charge(upload.size)
+        payload = base64_payload(upload, current_user)
+    await resumable.delete_session(redis_client, upload_id)
+    return payload
+
+@router.post("/{upload_id}/resize", summary="Resize a finished image upload")
+async def finalize_resize(
+    upload_id: UploadId,
+    width: int = Query(400, gt=0, le=MAX_OUTPUT_DIMENSION),
+    height: int = Query(400, gt=0, le=MAX_OUTPUT_DIMENSION),
+    quality: int = 80,
+    frame_step: int = Query(1, ge=1),
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    upload = await _completed_upload(redis_client, upload_id, str(current_user.id), settings.MAX_IMAGE_UPLOAD_MB)
+    with upload:
+        ensure_image_content_type(upload.content_type)
+        pixels = await charge_image_usage(usage, upload, frame_step, size=(width, height))
+        try:
+            content = await run_image_operation(resize_image, upload, pixels, width, height, quality, frame_step)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Image processing failed: {e}")
+    await resumable.delete_session(redis_client, upload_id)
+    return image_response(content, upload.content_type, f"resized-{upload.filename}")
+
+@router.post("/{upload_id}/upscale", summary="Upscale a finished image upload")
+async def finalize_upscale(
+    upload_id: UploadId,
+    scale_factor: float = Query(2.0, gt=0, le=MAX_SCALE_FACTOR),
+    frame_step: int = Query(1, ge=1),
+    current_user = Depends(get_current_user), # Protected
+    redis_client: redis.Redis = Depends(get_redis_client),
+    usage: UsageMeter = Depends(get_usage_meter),
+):
+    upload = await _completed_upload(redis_client, upload_id, str(current_user.id), settings.MAX_IMAGE_UPLOAD_MB)
+    with upload:
+        ensure_image_content_type(upload.content_type)
+        pixels = await charge_image_usage(usage, upload, frame_step, scale_factor=scale_factor)
+        try:
+            content = await run_image_operation(upscale_image, upload, pixels, scale_factor, frame_step)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Image upscaling failed: {e}")
+    await resumable.delete_session(redis_client, upload_id)
+    return image_response(content, upload.content_type, f"upscaled-{upload.filename}")
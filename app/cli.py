@@ -0,0 +1,49 @@
+# app/cli.py
+
+"""
+Command line tools.
+
+    python -m app.cli import-users users.csv [--format csv|ndjson] [--batch-size 1000]
+
+Results are printed as NDJSON (per-row results to stdout, progress to stderr).
+"""
+
+import argparse
+import json
+import sys
+
+from app.core.provisioning import BATCH_SIZE, detect_format, import_users
+from app.db.database import SessionLocal, init_engine
+
+
+def _import_users(args: argparse.Namespace) -> int:
+    init_engine()
+    fmt = args.format or detect_format(args.path, None)
+    summary = {}
+    with open(args.path, "rb") as stream, SessionLocal() as db:
+        for result in import_users(db, stream, fmt, args.batch_size):
+            if "progress" in result:
+                print(json.dumps(result), file=sys.stderr)
+                continue
+            print(json.dumps(result))
+            summary = result.get("summary", summary)
+    # Non-zero exit if any row was rejected, so scripts notice
+    return 1 if summary.get("invalid") else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    users = commands.add_parser("import-users", help="Bulk-create Basic Auth users from CSV or NDJSON")
+    users.add_argument("path")
+    users.add_argument("--format", choices=["csv", "ndjson"])
+    users.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    users.set_defaults(handler=_import_users)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# app/core/compression.py
+
+"""
+Streaming compression helpers for the file tools.
+
+Everything here works on file objects and yields output chunks, so memory use
+stays constant whatever the input size. The generators are blocking: hand them
+to a StreamingResponse (Starlette iterates sync generators in a worker thread).
+"""
+
+import base64
+import bz2
+import lzma
+import os
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
+
+FORMATS = ("gzip", "zlib", "bz2", "lzma")
+
+MEDIA_TYPES = {
+    "gzip": "application/gzip",
+    "zlib": "application/zlib",
+    "bz2": "application/x-bzip2",
+    "lzma": "application/x-xz",
+}
+EXTENSIONS = {"gzip": ".gz", "zlib": ".zz", "bz2": ".bz2", "lzma": ".xz"}
+
+# Level per format for each speed preset. lzma "best" stops at 6: presets 7-9
+# need several hundred MB of RAM per request.
+PRESETS = {
+    "fast": {"gzip": 1, "zlib": 1, "bz2": 1, "lzma": 0, "zip": 1},
+    "balanced": {"gzip": 6, "zlib": 6, "bz2": 5, "lzma": 3, "zip": 6},
+    "best": {"gzip": 9, "zlib": 9, "bz2": 9, "lzma": 6, "zip": 9},
+}
+LEVEL_RANGES = {"gzip": (0, 9), "zlib": (0, 9), "bz2": (1, 9), "lzma": (0, 9), "zip": (0, 9)}
+
+READ_SIZE = 1024 * 1024
+# Inputs of at least this size are gzipped block-parallel (when parallel=True)
+PARALLEL_GZIP_MIN_BYTES = 4 * 1024 * 1024
+PARALLEL_BLOCK_SIZE = 1024 * 1024
+
+_BLOCK_WORKERS = os.cpu_count() or 1
+_block_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_block_pool() -> ThreadPoolExecutor:
+    global _block_pool
+    if _block_pool is None:
+        _block_pool = ThreadPoolExecutor(max_workers=_BLOCK_WORKERS, thread_name_prefix="compress")
+    return _block_pool
+
+
+def resolve_level(fmt: str, level: Optional[int], preset: str) -> int:
+    """Returns the explicit level if given (validated), otherwise the preset's level."""
+    if level is None:
+        return PRESETS[preset][fmt]
+    low, high = LEVEL_RANGES[fmt]
+    if not low <= level <= high:
+        raise ValueError(f"{fmt} level must be between {low} and {high}.")
+    return level
+
+
+def _read_blocks(stream: BinaryIO, size: int = READ_SIZE) -> Iterator[bytes]:
+    while block := stream.read(size):
+        yield block
+
+
+def _compressor(fmt: str, level: int):
+    if fmt == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if fmt == "zlib":
+        return zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS)
+    if fmt == "bz2":
+        return bz2.BZ2Compressor(level)
+    return lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=level)
+
+
+def compress_chunks(stream: BinaryIO, fmt: str, level: int) -> Iterator[bytes]:
+    """Compresses `stream` into one `fmt` stream, yielding output as it is produced."""
+    compressor = _compressor(fmt, level)
+    for block in _read_blocks(stream):
+        if out := compressor.compress(block):
+            yield out
+    yield compressor.flush()
+
+
+def _gzip_member(block: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush()
+
+
+def parallel_gzip_chunks(stream: BinaryIO, level: int, block_size: int = PARALLEL_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    pigz-style gzip: each block becomes an independent gzip member, compressed
+    on the thread pool (zlib releases the GIL). Concatenated members are a valid
+    gzip file. At most 2 blocks per worker are in flight, so memory stays bounded.
+    """
+    pool = _get_block_pool()
+    max_in_flight = 2 * _BLOCK_WORKERS
+    pending = deque()
+    for block in _read_blocks(stream, block_size):
+        pending.append(pool.submit(_gzip_member, block, level))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _decompressor_factory(fmt: str) -> Callable:
+    if fmt == "gzip":
+        return lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if fmt == "zlib":
+        return lambda: zlib.decompressobj(zlib.MAX_WBITS)
+    if fmt == "bz2":
+        return bz2.BZ2Decompressor
+    return lzma.LZMADecompressor
+
+
+def decompress_chunks(stream: BinaryIO, fmt: str, max_output: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Decompresses `stream`, yielding at most READ_SIZE bytes at a time.
+    Concatenated members/streams (e.g. parallel gzip output) are all decoded.
+    Raises ValueError on corrupt or truncated input, or once `max_output` bytes
+    have been produced (decompression bomb guard).
+    """
+    factory = _decompressor_factory(fmt)
+    is_zlib = fmt in ("gzip", "zlib")
+    decompressor = factory()
+    started = False
+    produced = 0
+
+    try:
+        for block in _read_blocks(stream):
+            data = block
+            while True:
+                started = started or bool(data)
+                out = decompressor.decompress(data, READ_SIZE)
+                if out:
+                    produced += len(out)
+                    if max_output is not None and produced > max_output:
+                        raise ValueError(f"Decompressed output exceeds {max_output} bytes.")
+                    yield out
+
+                if decompressor.eof:
+                    # The next member of a multi-member file starts in unused_data
+                    data = decompressor.unused_data
+                    decompressor = factory()
+                    started = False
+                    if not data:
+                        break
+                elif is_zlib:
+                    # Loop again while input is left or the output was capped at READ_SIZE
+                    data = decompressor.unconsumed_tail
+                    if not data and len(out) < READ_SIZE:
+                        break
+                else:
+                    if decompressor.needs_input:
+                        break
+                    data = b""
+    except (zlib.error, OSError, lzma.LZMAError, EOFError) as e:
+        raise ValueError(f"Invalid {fmt} data: {e}") from e
+
+    if started:
+        raise ValueError(f"Invalid {fmt} data: stream is truncated.")
+
+
+def base64_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Base64-encodes a byte stream chunk by chunk (input is re-aligned to 3-byte groups)."""
+    remainder = b""
+    for chunk in chunks:
+        data = remainder + chunk if remainder else chunk
+        cut = len(data) - len(data) % 3
+        remainder = data[cut:]
+        if cut:
+            yield base64.b64encode(data[:cut])
+    if remainder:
+        yield base64.b64encode(remainder)
+
+
+class _ChunkSink:
+    """Write-only file object that zipfile writes into; output is collected by `drain`."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        chunks, self._chunks = self._chunks, []
+        yield from chunks
+
+
+def _unique_name(name: str, used: set) -> str:
+    candidate, counter = name, 1
+    root, ext = os.path.splitext(name)
+    while candidate in used:
+        candidate = f"{root} ({counter}){ext}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def zip_chunks(entries: Iterable[tuple[str, BinaryIO, int]], level: int) -> Iterator[bytes]:
+    """
+    Streams a ZIP archive of (name, stream, size) entries. zipfile writes to a
+    non-seekable sink using data descriptors, so nothing is buffered beyond one
+    READ_SIZE block; `size` only decides whether an entry needs ZIP64.
+    """
+    sink = _ChunkSink()
+    used_names: set = set()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=level) as archive:
+        for name, stream, size in entries:
+            info = zipfile.ZipInfo(_unique_name(os.path.basename(name) or "file", used_names), datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.file_size = size
+            stream.seek(0)
+            with archive.open(info, mode="w") as dest:
+                for block in _read_blocks(stream):
+                    dest.write(block)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
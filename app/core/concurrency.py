@@ -0,0 +1,129 @@
+# app/core/concurrency.py
+
+"""
+Adaptive concurrency limits per route class (load shedding).
+
+Each class of routes (auth, image, file, monitoring, admin) gets its own limiter,
+so a flood of image resizes cannot starve logins or health checks. The limit
+follows AIMD on observed latency: it grows by ~1 per round trip while requests
+are fast and the limiter is saturated, and shrinks multiplicatively when
+latency exceeds the target. Requests beyond the limit wait in a bounded queue;
+when the queue is full (or the wait times out) they are shed with 503.
+This is independent of the per-client rate limits (fastapi_limiter).
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque
+
+from app.core import metrics
+
+
+@dataclass
+class LimiterConfig:
+    initial_limit: int
+    min_limit: int
+    max_limit: int
+    # Requests allowed to wait for a slot before new ones are shed
+    max_queue: int
+    # Longest a queued request waits for a slot (seconds)
+    queue_timeout: float
+    # Time to first response byte considered healthy for this class (seconds)
+    target_latency: float
+    backoff: float = 0.9
+
+
+# Defaults per route class. Auth includes Argon2 hashing (~50-100 ms per call);
+# image work is the heaviest and is the first to be throttled.
+ROUTE_CLASS_LIMITS = {
+    "auth": LimiterConfig(initial_limit=16, min_limit=2, max_limit=64, max_queue=64, queue_timeout=2.0, target_latency=0.5),
+    "image": LimiterConfig(initial_limit=8, min_limit=1, max_limit=64, max_queue=32, queue_timeout=5.0, target_latency=2.0),
+    "file": LimiterConfig(initial_limit=16, min_limit=2, max_limit=128, max_queue=64, queue_timeout=5.0, target_latency=2.0),
+    # Bulk user imports: Argon2 for every row, the first progress line can take seconds
+    "admin": LimiterConfig(initial_limit=2, min_limit=1, max_limit=4, max_queue=4, queue_timeout=5.0, target_latency=10.0),
+    "monitoring": LimiterConfig(initial_limit=32, min_limit=8, max_limit=64, max_queue=32, queue_timeout=1.0, target_latency=0.5),
+}
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter with a bounded FIFO wait queue (one per worker process)."""
+
+    def __init__(self, name: str, config: LimiterConfig):
+        self.name = name
+        self.config = config
+        self.limit = float(config.initial_limit)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"concurrency_{self.name}_limit", round(self.limit, 2))
+        metrics.set_gauge(f"concurrency_{self.name}_in_flight", self.in_flight)
+        metrics.set_gauge(f"concurrency_{self.name}_queued", len(self._waiters))
+
+    async def acquire(self) -> bool:
+        """Takes a slot, waiting in the queue if needed. Returns False if the request must be shed."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            return True
+
+        if len(self._waiters) >= self.config.max_queue:
+            metrics.increment(f"concurrency_{self.name}_shed")
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            # release() hands the slot over by resolving the future (in_flight already counted)
+            await asyncio.wait_for(waiter, self.config.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            metrics.increment(f"concurrency_{self.name}_shed")
+            return False
+        except asyncio.CancelledError:
+            # Client went away; if a slot was already handed over, give it back
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+
+    def release(self, latency: float) -> None:
+        """Frees a slot and adapts the limit from the request's latency (seconds)."""
+        self._adjust(latency)
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hands free slots to queued requests, as many as the (possibly new) limit allows."""
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
+        self._publish()
+
+    def _adjust(self, latency: float) -> None:
+        config = self.config
+        now = time.monotonic()
+        if latency > config.target_latency:
+            # Multiplicative decrease, at most once per target interval so one
+            # burst of slow responses does not collapse the limit to the floor
+            if now - self._last_decrease >= config.target_latency:
+                self.limit = max(config.min_limit, self.limit * config.backoff)
+                self._last_decrease = now
+        elif self.in_flight >= int(self.limit):
+            # Additive increase: ~+1 per full window of fast responses
+            self.limit = min(config.max_limit, self.limit + 1 / self.limit)
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait before retrying."""
+        return max(1, round(self.config.queue_timeout))
@@ -21,15 +21,78 @@ class Settings(BaseSettings):
     # --- JWT Security Settings (Can be in .env or hardcoded) ---
     SECRET_KEY: str = "your-strong-jwt-secret-key-change-this" 
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Access tokens are short-lived; clients renew them with the refresh token
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    # Per-worker Bloom filter of revoked sessions (see app/core/sessions.py)
+    REVOCATION_FILTER_CAPACITY: int = 100_000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_FILTER_REBUILD_SECONDS: int = 300
 
     # --- Google SSO Settings (Load from .env if available, or use placeholders) ---
     GOOGLE_CLIENT_ID: str = "YOUR_GOOGLE_CLIENT_ID_FROM_CONSOLE"
     GOOGLE_CLIENT_SECRET: str = "YOUR_GOOGLE_CLIENT_SECRET_FROM_CONSOLE"
     REDIRECT_URI: str = "http://localhost:8000/auth/google/callback"
+    GOOGLE_DISCOVERY_URL: str = "https://accounts.google.com/.well-known/openid-configuration"
+    # Discovery document / signing keys are cached this long unless the provider sends max-age
+    OAUTH_CACHE_TTL_SECONDS: int = 3600
+    OAUTH_HTTP_TIMEOUT_SECONDS: float = 10.0
     CORS_ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:8000"
     REDIS_URL: str = "redis://localhost:6379/0"
-    
+    # Comma separated; these users may call the /admin endpoints
+    ADMIN_EMAILS: str = ""
+
+    # --- Upload Settings ---
+    # Uploads up to this size stay in memory; larger ones are spooled to a temp file
+    UPLOAD_SPOOL_MAX_KB: int = 1024
+    # Per-route hard limits, enforced before the request body is fully read (413)
+    MAX_FILE_UPLOAD_MB: int = 100
+    MAX_IMAGE_UPLOAD_MB: int = 25
+    # /tools/files/hash only streams its input, so it accepts much larger bodies
+    MAX_HASH_UPLOAD_MB: int = 10240
+    # Output cap for /tools/files/decompress (guards against decompression bombs)
+    MAX_DECOMPRESSED_MB: int = 1024
+    # /admin/users/import CSV/NDJSON files
+    MAX_IMPORT_UPLOAD_MB: int = 200
+
+    # --- Response Compression Settings ---
+    # Bodies below this size are sent uncompressed
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    # Chunks at least this large are compressed in a worker thread
+    RESPONSE_COMPRESSION_THREAD_BYTES: int = 256 * 1024
+
+    # --- Image Processing ---
+    # Largest output (width x height x frames) a resize/upscale may produce (400 above it)
+    MAX_OUTPUT_MEGAPIXELS: int = 100
+    # Image processes for resize/upscale (0 = worker threads). Uploads and
+    # results are passed through pooled shared memory (see app/core/shm.py);
+    # /dev/shm must have room for the segments in flight.
+    IMAGE_PROCESS_WORKERS: int = 0
+    # Released segments kept for reuse, per API worker
+    IMAGE_SHM_MAX_IDLE_MB: int = 256
+    # Output segment size cap; larger results come back through the process pipe
+    IMAGE_SHM_MAX_OUTPUT_MB: int = 64
+
+    # --- Load Shedding ---
+    # Per route class adaptive concurrency limits (see app/core/concurrency.py)
+    LOAD_SHEDDING_ENABLED: bool = True
+
+    # --- Resumable Upload Settings ---
+    UPLOAD_STORAGE_DIR: str = "/tmp/resumable-uploads"
+    MAX_RESUMABLE_UPLOAD_MB: int = 2048
+    MAX_UPLOAD_CHUNK_MB: int = 16
+    # Idle sessions (and their partial files) are dropped after this long
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 60 * 60
+    UPLOAD_CLEANUP_INTERVAL_SECONDS: int = 10 * 60
+
+    # --- Usage Accounting / Quotas ---
+    # Daily per-user limits on the tool routes (UTC days); 0 disables a quota
+    USAGE_DAILY_BYTES_QUOTA_MB: int = 10240
+    USAGE_DAILY_MEGAPIXELS_QUOTA: int = 5000
+    # Counters live in Redis and are written to the `usage` table this often
+    USAGE_FLUSH_INTERVAL_SECONDS: int = 30
+    USAGE_FLUSH_BATCH_SIZE: int = 500
+
     # -------------------------------------------------------------
     # Pydantic Model Validator to construct the final URL
     # -------------------------------------------------------------
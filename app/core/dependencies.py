@@ -3,16 +3,21 @@
 from typing import Generator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
-from app.db.database import SessionLocal
+from app.db.database import SessionLocal, init_engine
 from app.core.security import decode_access_token
-from app.db.models import User
-from app.core.redis_client import redis_client as global_redis_client
+from app.db.queries import get_auth_user
+from app.core.redis_client import get_client
 import redis.asyncio as redis 
 from app.core.config import settings
+from app.core.usage import UsageMeter
+from app.core.sessions import revocations
 # Dependency to get the database session (keeping it here for context)
 def get_db() -> Generator:
     """Provides a database session for each request."""
+    # No-op once the lifespan has created the engine; covers scripts/CLIs that skip it.
+    init_engine()
     db = SessionLocal()
     try:
         yield db
@@ -21,55 +26,49 @@ def get_db() -> Generator:
 
 def get_redis_client() -> redis.Redis:
     """
-    Dependency to access the global, initialized Redis client.
-    Raises 500 if the client was not initialized during startup.
+    Dependency to access the global Redis client created by the app lifespan.
+    Every request shares its connection pool instead of opening new connections.
     """
-    redis_client = redis.from_url(
-        settings.REDIS_URL,
-        encoding="utf-8",
-        decode_responses=True
-    ) 
-    if redis_client is None:
-        # This shouldn't happen if startup was successful, but is a safe guard
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Redis client not initialized."
-        )
-    return redis_client
-
-# Note: If your DB dependency uses a 'yield' (Generator) pattern, 
-# you should also use a yield pattern here, but for Redis client access, 
-# simply returning the global instance is often sufficient.
+    return get_client()
 
 # Dependency for JWT/Bearer token authentication
 security_scheme = HTTPBearer()
 
-def get_current_user(
+async def get_token_payload(
     credentials: HTTPAuthorizationCredentials = Depends(security_scheme),
-    db: Session = Depends(get_db) # Inject the database session
-) -> User:
-    """Verifies the JWT and returns the User model object."""
-    
-    token = credentials.credentials 
-    payload = decode_access_token(token)
-    
-    if payload is None:
+    redis_client: redis.Redis = Depends(get_redis_client),
+) -> dict:
+    """Verifies the JWT and that its session has not been revoked; returns its claims."""
+    payload = decode_access_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    username: str = payload.get("sub")
-    if username is None:
+
+    # Local Bloom filter lookup; Redis is only asked on a (possibly false) hit
+    sid = payload.get("sid")
+    if sid is not None and await revocations.is_revoked(redis_client, sid):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
+            detail="Session has been revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
+
+def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db) # Inject the database session
+) -> Row:
+    """
+    Returns the token owner's auth columns (id, email, hashed_password,
+    is_active, auth_method) as a read-only row.
+    """
+    username: str = payload["sub"]
     
-    # NEW: Fetch the user object from the database using the email (username)
-    user = db.query(User).filter(User.email == username).first()
+    # Column-restricted lookup served by the covering lower(email) index
+    user = get_auth_user(db, username)
     
     if user is None:
         raise HTTPException(
@@ -78,4 +77,18 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
         
-    return user # Return the full User object
\ No newline at end of file
+    return user
+
+def get_usage_meter(
+    current_user: Row = Depends(get_current_user),
+    redis_client: redis.Redis = Depends(get_redis_client),
+) -> UsageMeter:
+    """Per-request handle for charging the current user's daily usage quotas."""
+    return UsageMeter(redis_client, str(current_user.id))
+
+def get_admin_user(current_user: Row = Depends(get_current_user)) -> Row:
+    """Like get_current_user, but only for the accounts listed in ADMIN_EMAILS."""
+    admins = {email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+    if current_user.email.lower() not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required.")
+    return current_user
@@ -0,0 +1,112 @@
+# app/core/frames.py
+
+"""
+Frame-by-frame processing of multi-frame images (animated GIF/WebP, multi-page TIFF).
+
+Frames are decoded one at a time with ImageSequence, transformed on a thread
+pool (Pillow's resampling releases the GIL) with at most a small window of
+frames in flight, and handed to the encoder in order. TIFF pages are written
+to the output as they arrive; Pillow's GIF and WebP encoders need the whole
+frame list, so for those only the transformed frames are kept in memory.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterator, Optional
+
+# Pillow is imported inside the functions (see app/api/image_tools.py)
+
+MULTI_FRAME_FORMATS = ("GIF", "WEBP", "TIFF")
+
+_FRAME_WORKERS = os.cpu_count() or 1
+_frame_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_frame_pool() -> ThreadPoolExecutor:
+    global _frame_pool
+    if _frame_pool is None:
+        _frame_pool = ThreadPoolExecutor(max_workers=_FRAME_WORKERS, thread_name_prefix="frames")
+    return _frame_pool
+
+
+def is_multi_frame(image) -> bool:
+    return image.format in MULTI_FRAME_FORMATS and getattr(image, "n_frames", 1) > 1
+
+
+def _detach(frame):
+    """ImageSequence reuses one Image object: copy the current frame before the next seek."""
+    if frame.mode in ("P", "PA", "1"):
+        # Palette frames are resized in RGBA so resampling does not mix palette indices
+        return frame.convert("RGBA")
+    return frame.copy()
+
+
+def sampled_frames(image, frame_step: int = 1) -> Iterator[tuple]:
+    """
+    Yields (frame, duration_ms) for every `frame_step`-th frame. The durations of
+    skipped frames are added to the frame kept before them, so the animation
+    keeps its overall timing.
+    """
+    from PIL import ImageSequence
+
+    kept, duration = None, 0
+    for index, frame in enumerate(ImageSequence.Iterator(image)):
+        if index % frame_step == 0:
+            if kept is not None:
+                yield kept, duration
+            kept, duration = _detach(frame), 0
+        else:
+            frame.load()  # WebP only reports a frame's duration once it is decoded
+        duration += frame.info.get("duration", 0)
+    if kept is not None:
+        yield kept, duration
+
+
+def transformed_frames(image, transform: Callable, frame_step: int = 1) -> Iterator[tuple]:
+    """Applies `transform` to each sampled frame in parallel, yielding (frame, duration_ms) in order."""
+    pool = _get_frame_pool()
+    max_in_flight = 2 * _FRAME_WORKERS
+    pending = deque()
+    for frame, duration in sampled_frames(image, frame_step):
+        pending.append((pool.submit(transform, frame), duration))
+        if len(pending) >= max_in_flight:
+            future, duration = pending.popleft()
+            yield future.result(), duration
+    while pending:
+        future, duration = pending.popleft()
+        yield future.result(), duration
+
+
+def save_frames(image, transform: Callable, out: BinaryIO, frame_step: int = 1, quality: int = 80) -> None:
+    """Transforms every (sampled) frame of `image` and encodes them to `out` in the input's format."""
+    from PIL import TiffImagePlugin
+
+    frames = transformed_frames(image, transform, frame_step)
+
+    if image.format == "TIFF":
+        # One page at a time: each page is written before the next is transformed
+        with TiffImagePlugin.AppendingTiffWriter(out, new=True) as tiff:
+            for frame, _ in frames:
+                frame.save(tiff, format="TIFF", compression="tiff_deflate")
+                tiff.newFrame()
+        return
+
+    first, first_duration = next(frames)
+    rest, durations = [], [first_duration]
+    for frame, duration in frames:
+        rest.append(frame)
+        durations.append(duration)
+
+    params = {"quality": quality} if image.format == "WEBP" else {}
+    if "loop" in image.info:
+        # Absent means "play once" for GIF; don't turn it into an endless loop
+        params["loop"] = image.info["loop"]
+    first.save(
+        out,
+        format=image.format,
+        save_all=True,
+        append_images=rest,
+        duration=durations,
+        **params,
+    )
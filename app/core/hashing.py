@@ -0,0 +1,151 @@
+# app/core/hashing.py
+
+import hashlib
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+# Order used when the client does not pick algorithms explicitly
+SUPPORTED_ALGORITHMS = ("sha256", "sha1", "md5", "blake2b", "crc32")
+
+# hashlib and zlib.crc32 release the GIL on large buffers, so updating each
+# digest of a chunk on its own thread uses several cores for a single file.
+_digest_pool: Optional[ThreadPoolExecutor] = None
+_MULTI_CORE = (os.cpu_count() or 1) > 1
+
+
+def _get_digest_pool() -> ThreadPoolExecutor:
+    global _digest_pool
+    if _digest_pool is None:
+        _digest_pool = ThreadPoolExecutor(max_workers=len(SUPPORTED_ALGORITHMS), thread_name_prefix="digest")
+    return _digest_pool
+
+
+class _CRC32:
+    """Adapter giving zlib.crc32 the hashlib update/hexdigest interface."""
+
+    def __init__(self):
+        self._value = 0
+
+    def update(self, data) -> None:
+        self._value = zlib.crc32(data, self._value)
+
+    def hexdigest(self) -> str:
+        return f"{self._value:08x}"
+
+
+def parse_algorithms(value: str) -> tuple[str, ...]:
+    """Parses a comma separated list like "sha256,md5"; raises ValueError on unknown names."""
+    algorithms = tuple(dict.fromkeys(name.strip().lower() for name in value.split(",") if name.strip()))
+    unknown = [name for name in algorithms if name not in SUPPORTED_ALGORITHMS]
+    if unknown or not algorithms:
+        raise ValueError(
+            f"Unsupported algorithm(s): {', '.join(unknown) or '(none)'}. "
+            f"Choose from: {', '.join(SUPPORTED_ALGORITHMS)}."
+        )
+    return algorithms
+
+
+class MultiHasher:
+    """Feeds every chunk to several digests at once (single pass over the data)."""
+
+    # Below this, thread hand-off costs more than the hashing itself
+    PARALLEL_THRESHOLD = 256 * 1024
+
+    def __init__(self, algorithms: Iterable[str] = SUPPORTED_ALGORITHMS):
+        self._hashers = {
+            name: _CRC32() if name == "crc32" else hashlib.new(name)
+            for name in algorithms
+        }
+        self.size = 0
+
+    def update(self, data) -> None:
+        hashers = list(self._hashers.values())
+        if _MULTI_CORE and len(hashers) > 1 and len(data) >= self.PARALLEL_THRESHOLD:
+            # Wait for all digests before returning: the caller may reuse `data`
+            for future in [_get_digest_pool().submit(hasher.update, data) for hasher in hashers]:
+                future.result()
+        else:
+            for hasher in hashers:
+                hasher.update(data)
+        self.size += len(data)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: hasher.hexdigest() for name, hasher in self._hashers.items()}
+
+
+class MultipartHasher:
+    """
+    Hashes the file parts of a multipart/form-data body while it arrives: the
+    body is parsed incrementally and each part's bytes go straight to a
+    MultiHasher, so nothing is spooled to disk or read twice.
+    Blocking: feed large chunks from a worker thread.
+    """
+
+    def __init__(self, boundary: bytes, algorithms: Iterable[str], field: str = "files"):
+        from python_multipart.multipart import MultipartParser
+
+        self._algorithms = tuple(algorithms)
+        self._field = field
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: Dict[str, str] = {}
+        self._current: Optional[MultiHasher] = None
+        self._filename: Optional[str] = None
+        self._finished: list[dict] = []
+        self.files_started = 0
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": lambda data, start, end: self._header_field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._header_value.extend(data[start:end]),
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._current = None
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.decode("latin-1").lower()] = self._header_value.decode("latin-1")
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        from python_multipart.multipart import parse_options_header
+
+        _, options = parse_options_header(self._headers.get("content-disposition", ""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        # Only file parts of the expected field are hashed; other fields are skipped
+        if name == self._field and b"filename" in options:
+            self._filename = options[b"filename"].decode("utf-8", "replace")
+            self._current = MultiHasher(self._algorithms)
+            self.files_started += 1
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current is not None:
+            self._current.update(memoryview(data)[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._current is not None:
+            self._finished.append({
+                "index": self.files_started - 1,
+                "filename": self._filename,
+                "size": self._current.size,
+                "digests": self._current.hexdigests(),
+            })
+            self._current = None
+
+    def write(self, chunk: bytes) -> list[dict]:
+        """Feeds a piece of the body; returns the files completed by it."""
+        self._parser.write(chunk)
+        finished, self._finished = self._finished, []
+        return finished
+
+    def finish(self) -> list[dict]:
+        self._parser.finalize()
+        finished, self._finished = self._finished, []
+        return finished
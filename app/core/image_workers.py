@@ -0,0 +1,160 @@
+# app/core/image_workers.py
+
+"""
+Optional process pool for image operations (IMAGE_PROCESS_WORKERS > 0).
+
+Uploads and results cross the process boundary through pooled shared memory
+segments (app/core/shm.py) instead of being pickled through the pool's pipe:
+the API worker copies the upload into an input segment once, the image
+process decodes straight from it and encodes straight into an output segment,
+and only segment names and lengths are pickled. The API worker then reads
+the result out of the output segment.
+
+The output segment is sized from the output's raw pixel size, which encoded
+images practically never exceed, up to IMAGE_SHM_MAX_OUTPUT_MB. If a result
+does not fit, the image process encodes it again in memory and returns the
+bytes through the pipe (`image_worker_output_spills` metric).
+
+Image processes keep recently used segments mapped, since pooled names come
+back, but no more than IMAGE_SHM_MAX_IDLE_MB of them: a segment the API
+worker has unlinked stays in /dev/shm for as long as anything maps it.
+
+With IMAGE_PROCESS_WORKERS = 0 (the default) image operations stay on the
+thread pool.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Callable, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.shm import SegmentFile, SegmentFull, SegmentRef, close_segment_pool, get_segment_pool
+from app.core.uploads import SpooledUpload
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger("app")
+
+_executor: Optional["ProcessPoolExecutor"] = None
+
+
+def _get_executor() -> "ProcessPoolExecutor":
+    global _executor
+    if _executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn, not fork: the API worker runs an event loop and threads
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_image_workers() -> None:
+    """Stops the image processes and unlinks the pooled segments (called from the app lifespan)."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+    close_segment_pool()
+
+
+async def run_in_image_process(operation: Callable, upload: SpooledUpload, output_capacity: int, *args) -> bytes:
+    """
+    Runs `operation(upload, *args, out=...)` in an image process and returns the
+    encoded result. `output_capacity` is the expected upper bound of its size.
+    """
+    global _executor
+    pool = get_segment_pool()
+    with pool.lease(upload.size) as source, pool.lease(output_capacity) as target:
+        await run_in_threadpool(source.write, upload.view())
+        try:
+            future = _get_executor().submit(_run, operation, source.ref(), target.ref(target.capacity), args)
+            # The image process uses both segments until the job ends, even if this request is cancelled
+            source.retain()
+            target.retain()
+            future.add_done_callback(lambda _: (source.release(), target.release()))
+            metrics.increment("image_worker_jobs")
+            result = await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # An image process died (e.g. killed for memory): start a fresh pool for the next job
+            logger.error("Image process pool broke, restarting it")
+            _executor = None
+            raise
+        if isinstance(result, bytes):
+            metrics.increment("image_worker_output_spills")
+            return result
+        return target.read(result)
+
+
+# --- Image process side ---
+
+# Segments are pooled, so the same names come back; keep the recently used ones
+# mapped, up to the pool's idle cap (beyond it the API worker unlinks them anyway)
+_attached: "OrderedDict[str, object]" = OrderedDict()
+_attached_bytes = 0
+
+
+def _attach(name: str) -> memoryview:
+    from multiprocessing import shared_memory
+
+    global _attached_bytes
+    segment = _attached.pop(name, None)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+        _attached_bytes += segment.size
+    _attached[name] = segment
+    return segment.buf
+
+
+def _detach_idle() -> None:
+    """Unmaps the least recently used segments beyond IMAGE_SHM_MAX_IDLE_MB (after each job)."""
+    global _attached_bytes
+    limit = settings.IMAGE_SHM_MAX_IDLE_MB * 1024 * 1024
+    while _attached and _attached_bytes > limit:
+        _, segment = _attached.popitem(last=False)
+        _attached_bytes -= segment.size
+        try:
+            segment.close()
+        except BufferError:
+            pass  # Still referenced; unmapped once collected
+
+
+class _SharedUpload:
+    """The part of SpooledUpload the image operations use, backed by an input segment."""
+
+    def __init__(self, source: SegmentRef):
+        self.size = source.size
+        self._buf = _attach(source.name)
+
+    def open(self) -> SegmentFile:
+        return SegmentFile(self._buf, self.size)
+
+
+def _run(operation: Callable, source: SegmentRef, target: SegmentRef, args: tuple) -> Union[int, bytes]:
+    """Returns the result's length in the output segment, or the result itself if it did not fit."""
+    try:
+        return _run_job(operation, source, target, args)
+    finally:
+        # The job's views of the segments are gone now, so they can be unmapped
+        _detach_idle()
+
+
+def _run_job(operation: Callable, source: SegmentRef, target: SegmentRef, args: tuple) -> Union[int, bytes]:
+    upload = _SharedUpload(source)
+    out = SegmentFile(_attach(target.name)[:target.size])
+    try:
+        operation(upload, *args, out=out)
+        return out.size
+    except SegmentFull:
+        return operation(upload, *args).getvalue()
+    finally:
+        out.close()
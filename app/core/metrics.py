@@ -0,0 +1,25 @@
+# app/core/metrics.py
+
+# Minimal in-process metrics, exposed as JSON by GET /status/metrics (admins only).
+# Values are per worker process; aggregate across workers in the scraper.
+
+import threading
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, float] = {}
+
+def increment(name: str, amount: int = 1) -> None:
+    """Adds `amount` to a monotonically increasing counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def set_gauge(name: str, value: float) -> None:
+    """Records the current value of something that goes up and down."""
+    with _lock:
+        _gauges[name] = value
+
+def snapshot() -> dict:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
@@ -0,0 +1,339 @@
+# app/core/middleware.py
+
+import importlib.util
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, Optional
+
+import anyio
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.concurrency import AdaptiveLimiter
+
+
+class _BodyTooLarge(HTTPException):
+    """Raised from the wrapped `receive` once a request body crosses its limit."""
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Enforces per-route request body limits before the body is fully read.
+
+    `limits` maps a path prefix to a maximum body size in bytes; the longest
+    matching prefix wins. Requests announcing a larger Content-Length are
+    rejected with 413 without reading the body. Streamed bodies (no or wrong
+    Content-Length) are counted while they are received and cut off at the limit.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        # Longest prefix first so "/tools/images" beats "/tools"
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str) -> Optional[int]:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the {limit // (1024 * 1024)} MB limit for this endpoint."
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await _too_large(detail)(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _BodyTooLarge(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            # Normally FastAPI turns the exception into a 413 itself; this covers
+            # bodies read outside a route (e.g. by another middleware).
+            if response_started:
+                raise
+            await _too_large(detail)(scope, receive, send)
+
+
+def _too_large(detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+
+# --- Response compression ---
+
+# Already-compressed media: recompressing wastes CPU for no gain
+INCOMPRESSIBLE_TYPES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/zlib",
+    "application/x-bzip2", "application/x-xz", "application/zstd", "application/pdf",
+)
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Z_SYNC_FLUSH pushes out everything so far, keeping streamed responses live
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        import brotli
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class _ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        import zstandard
+        self._zstandard = zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        mode = (
+            self._zstandard.COMPRESSOBJ_FLUSH_FINISH if final
+            else self._zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+@lru_cache(maxsize=1)
+def available_encodings() -> tuple[str, ...]:
+    """Encodings this server can produce, best first (brotli/zstd only if installed)."""
+    encodings = []
+    for name, module in (("br", "brotli"), ("zstd", "zstandard")):
+        if importlib.util.find_spec(module) is not None:
+            encodings.append(name)
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Picks the best available encoding the client accepts (q > 0), or None."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token.strip().lower()] = quality
+    candidates = [
+        name for name in available_encodings()
+        if accepted.get(name, accepted.get("*", 0.0)) > 0
+    ]
+    return max(candidates, key=lambda name: accepted.get(name, accepted.get("*", 0.0)), default=None)
+
+
+class ResponseCompressionMiddleware:
+    """
+    Content-negotiated response compression (brotli / zstd / gzip).
+
+    - Bodies smaller than `minimum_size` and already-compressed media types
+      (the image tools' JPEG/PNG/WebP, archives) are passed through untouched.
+    - Each body chunk is compressed and flushed as it arrives, so streaming
+      responses (NDJSON, file downloads) keep streaming.
+    - Chunks of `thread_threshold` bytes or more are compressed in a worker
+      thread to keep the event loop responsive.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        thread_threshold: int = 256 * 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self._levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+
+    def _encoder(self, name: str):
+        if name == "br":
+            return _BrotliEncoder(self._levels["br"])
+        if name == "zstd":
+            return _ZstdEncoder(self._levels["zstd"])
+        return _GzipEncoder(self._levels["gzip"])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder = None
+        passthrough = False
+
+        async def compress(data: bytes, final: bool) -> bytes:
+            if len(data) >= self.thread_threshold:
+                return await anyio.to_thread.run_sync(encoder.compress, data, final)
+            return encoder.compress(data, final)
+
+        async def compressing_send(message: Message) -> None:
+            nonlocal start_message, encoder, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                content_length = headers.get("content-length")
+                passthrough = (
+                    "content-encoding" in headers
+                    or "no-transform" in headers.get("cache-control", "")
+                    or message["status"] < 200 or message["status"] in (204, 304)
+                    or content_type.startswith(INCOMPRESSIBLE_TYPES)
+                    or (content_length is not None and int(content_length) < self.minimum_size)
+                )
+                if passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    # Small single-chunk body: not worth compressing
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = self._encoder(encoding)
+                headers = MutableHeaders(raw=start_message["headers"])
+                del headers["content-length"]
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    compressed = await compress(body, final=True)
+                    headers["content-length"] = str(len(compressed))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed, "more_body": False})
+                    return
+                await send(start_message)
+
+            await send({
+                "type": "http.response.body",
+                "body": await compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, compressing_send)
+
+
+# --- Adaptive concurrency limits / load shedding ---
+
+class ConcurrencyLimitMiddleware:
+    """
+    Routes each request to the AdaptiveLimiter of its route class (matched by
+    path prefix, longest first) and sheds it with 503 + Retry-After when that
+    class is overloaded. Latency is measured from the last request body chunk
+    received before the response starts (the request start for bodiless
+    requests) to the start of the response: slow client uploads and long
+    streamed downloads do not look like a slow backend.
+    """
+
+    def __init__(self, app: ASGIApp, route_classes: Dict[str, str], limiters: Dict[str, AdaptiveLimiter]):
+        self.app = app
+        self.route_classes = sorted(route_classes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.limiters = limiters
+
+    def _limiter_for(self, path: str) -> Optional[AdaptiveLimiter]:
+        for prefix, route_class in self.route_classes:
+            if path.startswith(prefix):
+                return self.limiters[route_class]
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self._limiter_for(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry shortly."},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(limiter.retry_after())},
+            )
+            await response(scope, receive, send)
+            return
+
+        # Until the response starts, the clock restarts with every body chunk:
+        # time spent waiting on the client is not backend latency
+        start = time.monotonic()
+        latency: Optional[float] = None
+
+        async def timed_receive() -> Message:
+            nonlocal start
+            message = await receive()
+            if message["type"] == "http.request" and latency is None:
+                start = time.monotonic()
+            return message
+
+        async def timed_send(message: Message) -> None:
+            nonlocal latency
+            if message["type"] == "http.response.start" and latency is None:
+                latency = time.monotonic() - start
+            await send(message)
+
+        try:
+            await self.app(scope, timed_receive, timed_send)
+        finally:
+            limiter.release(latency if latency is not None else time.monotonic() - start)
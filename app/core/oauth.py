@@ -0,0 +1,243 @@
+# app/core/oauth.py
+
+"""
+OpenID Connect client for Google SSO (replaces fastapi_sso).
+
+- One pooled httpx.AsyncClient, opened and closed by the app lifespan, so the
+  token exchange reuses keep-alive connections to the provider.
+- The discovery document and the signing keys (JWKS) are cached for their
+  Cache-Control max-age (OAUTH_CACHE_TTL_SECONDS if absent) and refreshed in
+  the background once most of that has passed, so logins never wait on them.
+  A token signed with an unknown `kid` forces one JWKS refresh (rate limited)
+  to pick up rotated keys. If a refresh fails the stale copy keeps being used.
+- The ID token from the token exchange is verified locally against the cached
+  keys (signature, issuer, audience, expiry, nonce, at_hash): no userinfo call.
+"""
+
+import asyncio
+import logging
+import re
+import secrets
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Union
+from urllib.parse import urlencode
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+# httpx and python-jose are imported on first use to keep app startup fast
+
+logger = logging.getLogger("app")
+
+ID_TOKEN_ALGORITHMS = ["RS256"]
+SCOPES = "openid email profile"
+# Cached documents are refreshed in the background after this share of their TTL
+REFRESH_AFTER = 0.8
+# Minimum time between JWKS refreshes forced by an unknown `kid`
+FORCED_JWKS_REFRESH_INTERVAL = 60
+# Cookie carrying state and nonce from /google/login to /google/callback
+STATE_COOKIE = "oauth_state"
+STATE_COOKIE_MAX_AGE = 10 * 60
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class OAuthError(Exception):
+    """The provider rejected the login, or returned something that failed verification."""
+
+
+# --- Shared HTTP client ---
+
+_http_client: Optional["httpx.AsyncClient"] = None
+
+
+def open_http_client() -> "httpx.AsyncClient":
+    """Returns the shared client, creating it if needed (called from the app lifespan)."""
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            timeout=settings.OAUTH_HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=10, keepalive_expiry=60),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# --- Cached provider documents ---
+
+class _CachedDocument:
+    """A JSON document fetched over HTTP, cached for its max-age and refreshed in the background."""
+
+    def __init__(self, url: Union[str, Callable[[], Awaitable[str]]], default_ttl: float):
+        self._url = url
+        self._default_ttl = default_ttl
+        self._value: Optional[dict] = None
+        self._fetched_at = 0.0
+        self._ttl = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get(self, force: bool = False) -> dict:
+        age = time.monotonic() - self._fetched_at
+        if self._value is None or force or age >= self._ttl:
+            try:
+                return await self._refresh()
+            except Exception as e:
+                if self._value is None:
+                    raise OAuthError(f"Could not fetch provider metadata: {e}") from e
+                logger.warning(f"OAuth document refresh failed, using cached copy: {e}")
+                return self._value
+        if age >= self._ttl * REFRESH_AFTER and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+        return self._value
+
+    async def _refresh(self) -> dict:
+        requested_at = time.monotonic()
+        async with self._lock:
+            if self._value is not None and self._fetched_at >= requested_at:
+                return self._value  # Refreshed by another caller while we waited
+            url = self._url if isinstance(self._url, str) else await self._url()
+            response = await open_http_client().get(url)
+            response.raise_for_status()
+            self._value = response.json()
+            match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+            self._ttl = int(match.group(1)) if match else self._default_ttl
+            self._fetched_at = time.monotonic()
+            return self._value
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self._refresh()
+        except Exception as e:
+            logger.warning(f"OAuth document background refresh failed: {e}")
+        finally:
+            self._refresh_task = None
+
+
+# --- Provider ---
+
+class OIDCProvider:
+    """Authorization code flow against an OpenID Connect provider described by `discovery_url`."""
+
+    def __init__(self, discovery_url: str, client_id: str, client_secret: str, redirect_uri: str, cache_ttl: float):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.metadata = _CachedDocument(discovery_url, cache_ttl)
+        # The JWKS location is only known from the discovery document
+        self.jwks = _CachedDocument(self._jwks_uri, cache_ttl)
+        self._last_forced_jwks_refresh = 0.0
+
+    async def _jwks_uri(self) -> str:
+        return (await self.metadata.get())["jwks_uri"]
+
+    async def authorization_url(self, state: str, nonce: str) -> str:
+        metadata = await self.metadata.get()
+        params = {
+            "response_type": "code",
+            "client_id": self.client_id,
+            "redirect_uri": self.redirect_uri,
+            "scope": SCOPES,
+            "state": state,
+            "nonce": nonce,
+        }
+        return f"{metadata['authorization_endpoint']}?{urlencode(params)}"
+
+    async def authenticate(self, code: str, nonce: str) -> dict:
+        """Exchanges the authorization code and returns the verified ID token claims."""
+        tokens = await self._exchange_code(code)
+        if "id_token" not in tokens:
+            raise OAuthError("Token response has no id_token.")
+        claims = await self.verify_id_token(tokens["id_token"], nonce, tokens.get("access_token"))
+        # An absent email_verified is not a verification: accounts are matched by email
+        if not claims.get("email") or claims.get("email_verified") is not True:
+            raise OAuthError("Provider did not return a verified email address.")
+        return claims
+
+    async def _exchange_code(self, code: str) -> dict:
+        import httpx
+
+        metadata = await self.metadata.get()
+        try:
+            response = await open_http_client().post(
+                metadata["token_endpoint"],
+                data={
+                    "grant_type": "authorization_code",
+                    "code": code,
+                    "redirect_uri": self.redirect_uri,
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                },
+                headers={"Accept": "application/json"},
+            )
+        except httpx.HTTPError as e:
+            raise OAuthError(f"Token exchange failed: {e}") from e
+        if response.status_code != 200:
+            raise OAuthError(f"Token exchange failed with status {response.status_code}.")
+        return response.json()
+
+    async def verify_id_token(self, id_token: str, nonce: str, access_token: Optional[str] = None) -> dict:
+        from jose import JWTError, jwt
+
+        try:
+            header = jwt.get_unverified_header(id_token)
+            key = await self._signing_key(header.get("kid"))
+            issuer = (await self.metadata.get())["issuer"]
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=ID_TOKEN_ALGORITHMS,
+                audience=self.client_id,
+                # Google also issues tokens with the scheme-less "accounts.google.com"
+                issuer=[issuer, issuer.removeprefix("https://")],
+                access_token=access_token,
+            )
+        except JWTError as e:
+            raise OAuthError(f"Invalid ID token: {e}") from e
+        if not secrets.compare_digest(str(claims.get("nonce", "")), nonce):
+            raise OAuthError("ID token nonce does not match.")
+        return claims
+
+    async def _signing_key(self, kid: Optional[str]) -> dict:
+        key = _find_key(await self.jwks.get(), kid)
+        now = time.monotonic()
+        if key is None and now - self._last_forced_jwks_refresh >= FORCED_JWKS_REFRESH_INTERVAL:
+            # Probably a key rotation: fetch the current key set once
+            self._last_forced_jwks_refresh = now
+            key = _find_key(await self.jwks.get(force=True), kid)
+        if key is None:
+            raise OAuthError("ID token is signed with an unknown key.")
+        return key
+
+
+def _find_key(jwks: dict, kid: Optional[str]) -> Optional[dict]:
+    for key in jwks.get("keys", []):
+        if key.get("kid") == kid:
+            return key
+    return None
+
+
+# --- Login state ---
+
+def new_login_state() -> tuple[str, str, str]:
+    """Returns (state, nonce, cookie value) for a new login attempt."""
+    state, nonce = secrets.token_urlsafe(24), secrets.token_urlsafe(24)
+    return state, nonce, f"{state}.{nonce}"
+
+
+def check_login_state(cookie: Optional[str], state: Optional[str]) -> str:
+    """Checks the callback's `state` against the login cookie (CSRF) and returns the nonce."""
+    expected, _, nonce = (cookie or "").partition(".")
+    if not expected or not state or not secrets.compare_digest(expected, state):
+        raise OAuthError("Login state does not match.")
+    return nonce
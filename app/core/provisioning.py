@@ -0,0 +1,158 @@
+# app/core/provisioning.py
+
+"""
+Bulk user provisioning (admin import endpoint and `python -m app.cli import-users`).
+
+Rows are read from CSV (header: email,password) or NDJSON and handled in
+batches: one set-based query finds the emails that already exist, Argon2
+hashes are computed in parallel on a thread pool (argon2-cffi releases the
+GIL while hashing), and new users are written with one multi-row
+INSERT .. ON CONFLICT DO NOTHING RETURNING per batch, committed batch by batch.
+Results are yielded as they are known: one entry per row plus a progress
+entry per batch, so a 100k-user import can be streamed as NDJSON.
+"""
+
+import csv
+import io
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, Literal, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.security import get_password_hash
+from app.db.models import User
+from app.db.queries import EMAIL_KEY
+from app.schemas.user import UserCreate
+
+ImportFormat = Literal["csv", "ndjson"]
+
+BATCH_SIZE = 1000
+
+_HASH_WORKERS = os.cpu_count() or 1
+_hash_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(max_workers=_HASH_WORKERS, thread_name_prefix="argon2")
+    return _hash_pool
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> ImportFormat:
+    if (filename or "").endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return "csv"
+
+
+def read_rows(stream: BinaryIO, fmt: ImportFormat) -> Iterator[tuple[int, object]]:
+    """Yields (line number, raw row). Unparseable NDJSON lines are yielded as the error message."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, f"Invalid JSON: {e.msg}"
+    finally:
+        # Leave the underlying upload/file open for its owner to close
+        text.detach()
+
+
+def _validate(raw: object) -> UserCreate:
+    if isinstance(raw, str):
+        raise ValueError(raw)
+    if not isinstance(raw, dict):
+        raise ValueError("Row must be an object with email and password.")
+    try:
+        return UserCreate.model_validate(raw)
+    except ValidationError as e:
+        error = e.errors()[0]
+        raise ValueError(f"{'.'.join(map(str, error['loc']))}: {error['msg']}")
+
+
+def _import_batch(db: Session, batch: list[tuple[int, object]], seen: set) -> tuple[list[dict], int]:
+    results: list[dict] = []
+    valid: list[tuple[int, UserCreate]] = []
+    for line, raw in batch:
+        try:
+            user = _validate(raw)
+        except ValueError as e:
+            results.append({"line": line, "status": "invalid", "detail": str(e)})
+            continue
+        # Emails are unique case-insensitively (ix_users_email_lower)
+        if user.email.lower() in seen:
+            results.append({"line": line, "email": user.email, "status": "duplicate"})
+            continue
+        seen.add(user.email.lower())
+        valid.append((line, user))
+
+    # One set-based lookup instead of a SELECT per row
+    emails = [user.email.lower() for _, user in valid]
+    existing = set(db.scalars(select(EMAIL_KEY).where(EMAIL_KEY.in_(emails)))) if emails else set()
+    new = [(line, user) for line, user in valid if user.email.lower() not in existing]
+    for line, user in valid:
+        if user.email.lower() in existing:
+            results.append({"line": line, "email": user.email, "status": "exists"})
+
+    created = 0
+    if new:
+        hashes = _get_hash_pool().map(get_password_hash, [user.password for _, user in new])
+        # ids are set here: a multi-row VALUES would share one evaluation of the column default
+        rows = [
+            {"id": uuid.uuid4(), "email": user.email, "hashed_password": hashed, "auth_method": "Basic", "is_active": True}
+            for (_, user), hashed in zip(new, hashes)
+        ]
+        # ON CONFLICT covers users registered concurrently since the lookup above
+        statement = insert(User).values(rows).on_conflict_do_nothing(index_elements=[EMAIL_KEY]).returning(User.email)
+        inserted = set(db.scalars(statement))
+        db.commit()
+        created = len(inserted)
+        for line, user in new:
+            results.append({"line": line, "email": user.email, "status": "created" if user.email in inserted else "exists"})
+
+    results.sort(key=lambda result: result["line"])
+    return results, created
+
+
+def import_users(db: Session, stream: BinaryIO, fmt: ImportFormat, batch_size: int = BATCH_SIZE) -> Iterator[dict]:
+    """
+    Imports users from `stream`, yielding per-row results
+    ({"line", "email", "status": created|exists|duplicate|invalid, "detail"}),
+    a {"progress": ...} entry after each batch and a final {"summary": ...}.
+    """
+    totals = {"processed": 0, "created": 0, "skipped": 0, "invalid": 0}
+    seen: set = set()
+    batch: list[tuple[int, object]] = []
+
+    def flush() -> Iterator[dict]:
+        results, created = _import_batch(db, batch, seen)
+        invalid = sum(1 for result in results if result["status"] == "invalid")
+        totals["processed"] += len(batch)
+        totals["created"] += created
+        totals["invalid"] += invalid
+        totals["skipped"] += len(batch) - created - invalid
+        batch.clear()
+        yield from results
+        yield {"progress": dict(totals)}
+
+    for row in read_rows(stream, fmt):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from flush()
+    if batch:
+        yield from flush()
+    yield {"summary": totals}
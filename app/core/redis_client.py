@@ -3,6 +3,24 @@
 import redis.asyncio as redis
 from typing import Optional
 
+from app.core.config import settings
+
 # This variable will hold the initialized Redis client instance.
-# It starts as None and gets set during application startup.
-redis_client: Optional[redis.Redis] = None
\ No newline at end of file
+# It is created on first use (normally by the app lifespan) and shared by every request.
+redis_client: Optional[redis.Redis] = None
+
+
+def get_client() -> redis.Redis:
+    """The shared client; its connection pool is reused across requests."""
+    global redis_client
+    if redis_client is None:
+        redis_client = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+    return redis_client
+
+
+async def close_client() -> None:
+    """Closes the shared client (called from the app lifespan); the next use creates a new one."""
+    global redis_client
+    client, redis_client = redis_client, None
+    if client is not None:
+        await client.aclose()
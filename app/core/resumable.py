@@ -0,0 +1,302 @@
+# app/core/resumable.py
+
+"""
+Storage for resumable (tus-like) uploads.
+
+Chunks are appended to `<UPLOAD_STORAGE_DIR>/<upload_id>.part` on local disk.
+Session metadata lives in Redis under `upload:<id>` (hash) and
+`upload:<id>:chunks` (list of "offset:size:sha256"), both with a TTL that is
+refreshed on every chunk. Part files whose session expired are removed by
+`cleanup_loop`, which runs in the application lifespan.
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Optional
+
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.uploads import MB
+from app.schemas.upload import UploadCreate
+
+logger = logging.getLogger("app")
+
+# tus answers a failed Upload-Checksum with the non-standard 460 status
+HTTP_460_CHECKSUM_MISMATCH = 460
+CHECKSUM_ALGORITHMS = {"sha256", "sha1", "md5"}
+# Part files younger than this are never purged (their session may be mid-creation)
+ORPHAN_GRACE_SECONDS = 60
+# The chunk lock expires unless renewed; it is renewed while the body streams
+LOCK_TTL_SECONDS = 60
+LOCK_RENEW_SECONDS = LOCK_TTL_SECONDS / 3
+
+# Lock scripts compare the owner token, so a request whose lock expired can
+# neither release nor extend a lock that another request has taken since
+_RELEASE_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+_RENEW_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Records the chunk and releases the lock, only if the lock is still ours
+_COMMIT_CHUNK = """
+if redis.call("GET", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("HSET", KEYS[2], "offset", ARGV[2])
+redis.call("RPUSH", KEYS[3], ARGV[3])
+redis.call("EXPIRE", KEYS[2], ARGV[4])
+redis.call("EXPIRE", KEYS[3], ARGV[4])
+redis.call("DEL", KEYS[1])
+return 1
+"""
+
+
+def session_key(upload_id: str) -> str:
+    return f"upload:{upload_id}"
+
+def chunks_key(upload_id: str) -> str:
+    return f"upload:{upload_id}:chunks"
+
+def lock_key(upload_id: str) -> str:
+    return f"upload:{upload_id}:lock"
+
+def part_path(upload_id: str) -> str:
+    return os.path.join(settings.UPLOAD_STORAGE_DIR, f"{upload_id}.part")
+
+
+async def create_session(redis_client: redis.Redis, user_id: str, data: UploadCreate) -> dict:
+    """Creates an empty part file and its Redis session; returns the session fields."""
+    max_bytes = settings.MAX_RESUMABLE_UPLOAD_MB * MB
+    if data.length > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds the {settings.MAX_RESUMABLE_UPLOAD_MB} MB limit.",
+        )
+
+    upload_id = uuid.uuid4().hex
+    os.makedirs(settings.UPLOAD_STORAGE_DIR, exist_ok=True)
+    open(part_path(upload_id), "wb").close()
+
+    session = {
+        "upload_id": upload_id,
+        "user_id": user_id,
+        "filename": data.filename,
+        "content_type": data.content_type,
+        "length": data.length,
+        "offset": 0,
+        "created_at": int(time.time()),
+    }
+    await redis_client.hset(session_key(upload_id), mapping=session)
+    await redis_client.expire(session_key(upload_id), settings.UPLOAD_SESSION_TTL_SECONDS)
+    return session
+
+
+async def get_session(redis_client: redis.Redis, upload_id: str, user_id: str) -> dict:
+    """Returns the session for `upload_id`, or 404 if it expired or belongs to another user."""
+    session = await redis_client.hgetall(session_key(upload_id))
+    if not session or session.get("user_id") != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found or expired.")
+    session["length"] = int(session["length"])
+    session["offset"] = int(session["offset"])
+    session["expires_in"] = max(await redis_client.ttl(session_key(upload_id)), 0)
+    return session
+
+
+async def delete_session(redis_client: redis.Redis, upload_id: str) -> None:
+    await redis_client.delete(session_key(upload_id), chunks_key(upload_id), lock_key(upload_id))
+    try:
+        os.remove(part_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def parse_checksum_header(header: Optional[str]) -> Optional[tuple[str, bytes]]:
+    """Parses a tus `Upload-Checksum: <algorithm> <base64 digest>` header."""
+    if not header:
+        return None
+    try:
+        algorithm, encoded = header.strip().split(" ", 1)
+        digest = base64.b64decode(encoded, validate=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed Upload-Checksum header.")
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise HTTPException(status_code=400, detail=f"Unsupported checksum algorithm: {algorithm}")
+    return algorithm, digest
+
+
+class _ChunkWriter:
+    """Writes one PATCH body at a fixed offset, hashing it on the way (runs in a worker thread)."""
+
+    def __init__(self, path: str, offset: int, checksum_algorithm: Optional[str]):
+        self.offset = offset
+        self.written = 0
+        self._file = open(path, "r+b")
+        # A crashed earlier request may have left bytes past the recorded offset
+        self._file.seek(offset)
+        self._sha256 = hashlib.sha256()
+        self._client_hash = (
+            hashlib.new(checksum_algorithm)
+            if checksum_algorithm and checksum_algorithm != "sha256" else self._sha256
+        )
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self._sha256.update(chunk)
+        if self._client_hash is not self._sha256:
+            self._client_hash.update(chunk)
+        self.written += len(chunk)
+
+    def finish(self, keep: bool) -> None:
+        """Truncates the file to the end of this chunk (or drops it when `keep` is False)."""
+        self._file.truncate(self.offset + (self.written if keep else 0))
+        self._file.close()
+
+    def abandon(self) -> None:
+        """Closes without truncating: the file now belongs to whoever holds the lock."""
+        self._file.close()
+
+    def sha256_hex(self) -> str:
+        return self._sha256.hexdigest()
+
+    def client_digest(self) -> bytes:
+        return self._client_hash.digest()
+
+
+async def append_chunk(
+    redis_client: redis.Redis,
+    session: dict,
+    offset: int,
+    body: AsyncIterator[bytes],
+    checksum_header: Optional[str] = None,
+) -> int:
+    """
+    Appends a PATCH body at `offset` and returns the new offset.
+
+    409 if `offset` does not match the stored offset, 423 if another PATCH for the
+    same upload is in progress, 413 if the chunk runs past the announced length,
+    460 if the Upload-Checksum does not match (the chunk is discarded).
+    """
+    upload_id = session["upload_id"]
+    if offset != session["offset"]:
+        raise _offset_conflict(session["offset"])
+    checksum = parse_checksum_header(checksum_header)
+
+    lock = lock_key(upload_id)
+    token = uuid.uuid4().hex
+    if not await redis_client.set(lock, token, nx=True, ex=LOCK_TTL_SECONDS):
+        raise HTTPException(status_code=status.HTTP_423_LOCKED, detail="Another chunk is being written.")
+    # Re-check under the lock: a concurrent PATCH may have advanced the offset meanwhile
+    stored_offset = int(await redis_client.hget(session_key(upload_id), "offset") or -1)
+    if stored_offset != offset:
+        await redis_client.eval(_RELEASE_LOCK, 1, lock, token)
+        raise _offset_conflict(stored_offset)
+
+    writer = await run_in_threadpool(_ChunkWriter, part_path(upload_id), offset, checksum and checksum[0])
+    keep = False
+    lock_lost = False
+    try:
+        renewed_at = time.monotonic()
+        async for chunk in body:
+            if offset + writer.written + len(chunk) > session["length"]:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Chunk extends past the announced upload length.",
+                )
+            if time.monotonic() - renewed_at >= LOCK_RENEW_SECONDS:
+                if not await redis_client.eval(_RENEW_LOCK, 1, lock, token, LOCK_TTL_SECONDS):
+                    lock_lost = True
+                    raise _lock_lost()
+                renewed_at = time.monotonic()
+            await run_in_threadpool(writer.write, chunk)
+
+        if checksum and writer.client_digest() != checksum[1]:
+            raise HTTPException(status_code=HTTP_460_CHECKSUM_MISMATCH, detail="Checksum mismatch.")
+        # Confirm (and extend) ownership before truncating the file to this chunk
+        if not await redis_client.eval(_RENEW_LOCK, 1, lock, token, LOCK_TTL_SECONDS):
+            lock_lost = True
+            raise _lock_lost()
+        keep = True
+    finally:
+        if lock_lost:
+            await run_in_threadpool(writer.abandon)
+        else:
+            await run_in_threadpool(writer.finish, keep)
+            if not keep:
+                await redis_client.eval(_RELEASE_LOCK, 1, lock, token)
+
+    new_offset = offset + writer.written
+    committed = await redis_client.eval(
+        _COMMIT_CHUNK, 3, lock, session_key(upload_id), chunks_key(upload_id),
+        token, new_offset, f"{offset}:{writer.written}:{writer.sha256_hex()}", settings.UPLOAD_SESSION_TTL_SECONDS,
+    )
+    if not committed:
+        # The lock expired mid-chunk (e.g. Redis was unreachable for a renewal); a retry may own the file now
+        raise _lock_lost()
+    return new_offset
+
+
+def _offset_conflict(stored_offset: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Upload-Offset mismatch: expected {stored_offset}.",
+        headers={"Upload-Offset": str(stored_offset)},
+    )
+
+
+def _lock_lost() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="The chunk lock expired before the chunk was stored; resume from the current offset.",
+    )
+
+
+async def purge_orphaned_parts(redis_client: redis.Redis) -> int:
+    """Deletes part files whose Redis session has expired; returns how many were removed."""
+    try:
+        entries = list(os.scandir(settings.UPLOAD_STORAGE_DIR))
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    now = time.time()
+    for entry in entries:
+        if not entry.name.endswith(".part") or now - entry.stat().st_mtime < ORPHAN_GRACE_SECONDS:
+            continue
+        upload_id = entry.name[: -len(".part")]
+        if not await redis_client.exists(session_key(upload_id)):
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+async def cleanup_loop(redis_client: redis.Redis) -> None:
+    """Periodically purges expired part files (started from the app lifespan)."""
+    while True:
+        try:
+            removed = await purge_orphaned_parts(redis_client)
+            if removed:
+                logger.info(f"Removed {removed} expired resumable upload(s).")
+        except Exception as e:
+            logger.error(f"Resumable upload cleanup failed: {e}")
+        await asyncio.sleep(settings.UPLOAD_CLEANUP_INTERVAL_SECONDS)
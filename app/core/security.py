@@ -1,15 +1,22 @@
 # app/core/security.py
 
 from datetime import datetime, timedelta, UTC
+from functools import lru_cache
 from typing import Optional
-from passlib.context import CryptContext
-from jose import jwt, JWTError
 from app.core.config import settings
 
+# passlib/argon2 and python-jose are imported inside the functions below so that
+# `import app.main` stays cheap (fast autoscaling and test startup). Python caches
+# the modules after the first call, so the per-request cost is a dict lookup.
+
 # Password Hashing Setup
 # 🚨 CHANGE: Switch from "bcrypt" to "argon2" 🚨
 # Argon2 is a modern algorithm that handles long passwords without the 72-byte limit.
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """Builds the Argon2 CryptContext on first use."""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["argon2"], deprecated="auto")
 
 # ----------------------------------------------------
 # ⚠️ REMOVE the _truncate_password helper function
@@ -19,7 +26,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hash."""
     
     # Argon2 handles the full length of plain_password
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """
@@ -27,11 +34,13 @@ def get_password_hash(password: str) -> str:
     """
     
     # Argon2 handles the full length of the password
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 # JWT Token Functions (Remain the same)
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Creates a JWT access token."""
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(UTC) + expires_delta
@@ -46,6 +55,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def decode_access_token(token: str) -> Optional[dict]:
     """Decodes and validates a JWT access token."""
+    from jose import jwt, JWTError
+
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -0,0 +1,192 @@
+# app/core/sessions.py
+
+"""
+Revocable login sessions: short-lived access tokens plus rotating refresh tokens.
+
+- Every login starts a session `sid`. Access tokens carry the `sid` (and a
+  `jti`) and live ACCESS_TOKEN_EXPIRE_MINUTES; the refresh token
+  ("{sid}.{secret}") is stored in Redis as a SHA-256 hash and replaced on
+  every use. Presenting an already-rotated refresh token means it leaked, so
+  the whole session is revoked.
+- Revoking a session deletes it and adds the sid to the `revoked_sessions`
+  ZSET (scored by when its last access token expires) and publishes it on the
+  `session_revocations` channel.
+- Each worker keeps the revoked sids in a Bloom filter, updated from the
+  channel and rebuilt from the ZSET periodically and on (re)connect. The
+  per-request check is a local lookup; only filter hits (revoked or false
+  positive) are confirmed against the ZSET. While the worker is not in sync
+  with Redis every check goes to Redis.
+"""
+
+import asyncio
+import hashlib
+import logging
+import secrets
+import time
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.core import metrics
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.core.security import create_access_token
+
+logger = logging.getLogger("app")
+
+REVOKED_KEY = "revoked_sessions"
+REVOCATION_CHANNEL = "session_revocations"
+
+# Swaps the stored refresh token hash if the presented one is current.
+# Returns {1, sub} on success, {-1} for a reused (already rotated) token, {0} if the session is gone.
+_ROTATE_REFRESH_TOKEN = """
+local current = redis.call("HGET", KEYS[1], "token_hash")
+if not current then
+    return {0}
+end
+if current ~= ARGV[1] then
+    return {-1}
+end
+redis.call("HSET", KEYS[1], "token_hash", ARGV[2])
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+return {1, redis.call("HGET", KEYS[1], "sub")}
+"""
+
+
+class InvalidRefreshToken(Exception):
+    """The refresh token is unknown, expired, revoked or was already used."""
+
+
+def session_key(sid: str) -> str:
+    return f"session:{sid}"
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _refresh_ttl() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+
+def _issue(sub: str, sid: str, refresh_token: str) -> dict:
+    expires_in = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    access_token = create_access_token(
+        data={"sub": sub, "sid": sid, "jti": uuid.uuid4().hex}, expires_delta=timedelta(seconds=expires_in)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token, "expires_in": expires_in}
+
+
+async def start_session(redis_client: redis.Redis, sub: str) -> dict:
+    """Starts a session for `sub` (the user's email) and returns its first token pair."""
+    sid = uuid.uuid4().hex
+    refresh_token = f"{sid}.{secrets.token_urlsafe(32)}"
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(session_key(sid), mapping={"sub": sub, "token_hash": _hash_token(refresh_token), "created_at": int(time.time())})
+        pipe.expire(session_key(sid), _refresh_ttl())
+        await pipe.execute()
+    return _issue(sub, sid, refresh_token)
+
+
+async def refresh_session(redis_client: redis.Redis, refresh_token: str) -> dict:
+    """Rotates the refresh token and returns a new token pair."""
+    sid, _, secret = refresh_token.partition(".")
+    if not sid or not secret:
+        raise InvalidRefreshToken()
+
+    new_refresh_token = f"{sid}.{secrets.token_urlsafe(32)}"
+    result = await redis_client.eval(
+        _ROTATE_REFRESH_TOKEN, 1, session_key(sid),
+        _hash_token(refresh_token), _hash_token(new_refresh_token), _refresh_ttl(),
+    )
+    if result[0] == -1:
+        # An old refresh token came back: someone else holds a copy. End the session for both.
+        logger.warning(f"Refresh token reuse detected, revoking session {sid}")
+        metrics.increment("refresh_token_reuse")
+        await revoke_session(redis_client, sid)
+    if result[0] != 1:
+        raise InvalidRefreshToken()
+    return _issue(result[1], sid, new_refresh_token)
+
+
+async def revoke_session(redis_client: redis.Redis, sid: str) -> None:
+    """Ends a session: its refresh token stops working and its access tokens are rejected."""
+    # Access tokens of this session are all expired after this point; drop the entry then
+    revoked_until = time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 60
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(session_key(sid))
+        pipe.zadd(REVOKED_KEY, {sid: revoked_until})
+        pipe.publish(REVOCATION_CHANNEL, sid)
+        await pipe.execute()
+    revocations.add(sid)
+
+
+# --- Per-worker revocation filter ---
+
+class RevocationFilter:
+    """This worker's copy of the revoked sids, kept in sync by `revocation_listener`."""
+
+    def __init__(self):
+        self._bloom = BloomFilter(settings.REVOCATION_FILTER_CAPACITY, settings.REVOCATION_FILTER_ERROR_RATE)
+        # False until the filter has been loaded from Redis (and again after losing the connection)
+        self.synced = False
+
+    def add(self, sid: str) -> None:
+        if sid in self._bloom:
+            return  # Already counted, e.g. this worker's own revocation echoed back by pub/sub
+        self._bloom.add(sid)
+        if self._bloom.count > self._bloom.capacity:
+            # Over capacity the error rate climbs; the next reload sizes it up
+            self.synced = False
+
+    async def reload(self, redis_client: redis.Redis) -> None:
+        """Rebuilds the filter from the ZSET, dropping entries whose tokens have all expired."""
+        now = time.time()
+        await redis_client.zremrangebyscore(REVOKED_KEY, 0, now)
+        sids = await redis_client.zrangebyscore(REVOKED_KEY, now, "+inf")
+        capacity = max(settings.REVOCATION_FILTER_CAPACITY, 2 * len(sids))
+        self._bloom = BloomFilter.from_items(sids, capacity, settings.REVOCATION_FILTER_ERROR_RATE)
+        self.synced = True
+        metrics.set_gauge("revoked_sessions", len(sids))
+
+    async def is_revoked(self, redis_client: redis.Redis, sid: str) -> bool:
+        if self.synced and sid not in self._bloom:
+            return False  # The common case: no network round trip
+        metrics.increment("revocation_checks_remote")
+        try:
+            score = await redis_client.zscore(REVOKED_KEY, sid)
+        except RedisError as e:
+            # Access tokens are short-lived; don't take every request down with Redis
+            logger.warning(f"Could not check session revocation: {e}")
+            return False
+        return score is not None and score > time.time()
+
+
+revocations = RevocationFilter()
+
+
+async def revocation_listener(redis_client: redis.Redis) -> None:
+    """Keeps `revocations` in sync with other workers (started from the app lifespan)."""
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                # Subscribe before loading, so nothing revoked in between is missed
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                await revocations.reload(redis_client)
+                reloaded_at = time.monotonic()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        revocations.add(message["data"])
+                    if not revocations.synced or time.monotonic() - reloaded_at >= settings.REVOCATION_FILTER_REBUILD_SECONDS:
+                        await revocations.reload(redis_client)
+                        reloaded_at = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            revocations.synced = False
+            logger.error(f"Revocation listener disconnected, retrying: {e}")
+            await asyncio.sleep(5)
@@ -0,0 +1,331 @@
+# app/core/shm.py
+
+"""
+Pooled shared memory segments for handing buffers to image worker processes
+(see app/core/image_workers.py) without pickling them.
+
+- Segments come in power-of-two size classes (at least MIN_SEGMENT_SIZE) and
+  are reused: released segments go back to a per-class free list, up to
+  IMAGE_SHM_MAX_IDLE_MB in total; beyond that they are unlinked.
+- A `Lease` is reference counted. Whoever hands a segment to another party
+  (e.g. a job still running in a worker after its request was cancelled)
+  `retain()`s it and `release()`s it when done; the segment returns to the
+  pool when the count reaches zero.
+- Leak detection: a lease that is garbage collected while still held is
+  logged with the place it was taken, counted in the `shm_leases_leaked`
+  metric, and its segment is reclaimed.
+- `SegmentFile` is a seekable file object over a segment, so Pillow can
+  decode from and encode into shared memory directly.
+- `share_pixels` / `attach_pixels` move decoded pixel buffers: the receiving
+  process wraps the segment as a Pillow image without copying.
+"""
+
+import io
+import logging
+import sys
+import threading
+import weakref
+from collections import defaultdict
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger("app")
+
+MIN_SEGMENT_SIZE = 256 * 1024
+
+
+def size_class(size: int) -> int:
+    """Smallest power of two >= `size` (and >= MIN_SEGMENT_SIZE)."""
+    return max(MIN_SEGMENT_SIZE, 1 << (max(size, 1) - 1).bit_length())
+
+
+class SegmentRef(NamedTuple):
+    """What a worker process needs to attach to a leased segment (picklable)."""
+    name: str
+    size: int
+
+
+def _destroy(segment: shared_memory.SharedMemory) -> None:
+    try:
+        segment.close()
+    except BufferError:
+        pass  # A view is still exported somewhere; the mapping goes away with it
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class Lease:
+    """A segment checked out of a `SegmentPool`. Holds `size` usable bytes (the segment may be larger)."""
+
+    def __init__(self, pool: "SegmentPool", segment: shared_memory.SharedMemory, size: int, origin: str):
+        self._pool = pool
+        self._segment = segment
+        self.size = size
+        # Shared with the finalizer, which must not keep the lease itself alive
+        self._state = {"refs": 1}
+        self._finalizer = weakref.finalize(self, pool._reclaim_leaked, segment, self._state, origin)
+
+    @property
+    def name(self) -> str:
+        return self._segment.name
+
+    @property
+    def capacity(self) -> int:
+        return self._segment.size
+
+    @property
+    def buf(self) -> memoryview:
+        if self._state["refs"] <= 0:
+            raise ValueError("Lease already released.")
+        return self._segment.buf
+
+    def ref(self, size: Optional[int] = None) -> SegmentRef:
+        return SegmentRef(self.name, self.size if size is None else size)
+
+    def write(self, data) -> int:
+        """Copies `data` (anything supporting the buffer protocol) to the start of the segment."""
+        with memoryview(data) as source:
+            length = source.nbytes
+            self.buf[:length] = source.cast("B")
+        return length
+
+    def read(self, length: int) -> bytes:
+        return bytes(self.buf[:length])
+
+    def retain(self) -> "Lease":
+        with self._pool._lock:
+            if self._state["refs"] <= 0:
+                raise ValueError("Lease already released.")
+            self._state["refs"] += 1
+        return self
+
+    def release(self) -> None:
+        with self._pool._lock:
+            if self._state["refs"] <= 0:
+                return
+            self._state["refs"] -= 1
+            if self._state["refs"] > 0:
+                return
+        self._finalizer.detach()
+        self._pool._give_back(self._segment)
+
+    def __enter__(self) -> "Lease":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class SegmentPool:
+    """Hands out `Lease`s on pooled shared memory segments. Thread-safe."""
+
+    def __init__(self, max_idle_bytes: int):
+        self.max_idle_bytes = max_idle_bytes
+        # Reentrant: a leaked lease can be finalized (by GC) while this thread holds the lock
+        self._lock = threading.RLock()
+        self._free: dict[int, list[shared_memory.SharedMemory]] = defaultdict(list)
+        self._idle_bytes = 0
+        self._leased = 0
+        self._closed = False
+
+    def lease(self, size: int) -> Lease:
+        capacity = size_class(size)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Segment pool is closed.")
+            free = self._free[capacity]
+            segment = free.pop() if free else None
+            if segment is not None:
+                self._idle_bytes -= capacity
+            self._leased += 1
+        if segment is None:
+            segment = shared_memory.SharedMemory(create=True, size=capacity)
+            metrics.increment("shm_segments_created")
+        else:
+            metrics.increment("shm_segments_reused")
+        return Lease(self, segment, size, _caller())
+
+    def _give_back(self, segment: shared_memory.SharedMemory) -> None:
+        with self._lock:
+            self._leased -= 1
+            keep = not self._closed and self._idle_bytes + segment.size <= self.max_idle_bytes
+            if keep:
+                self._free[segment.size].append(segment)
+                self._idle_bytes += segment.size
+            metrics.set_gauge("shm_idle_bytes", self._idle_bytes)
+        if not keep:
+            _destroy(segment)
+
+    def _reclaim_leaked(self, segment: shared_memory.SharedMemory, state: dict, origin: str) -> None:
+        if state["refs"] <= 0:
+            return
+        state["refs"] = 0
+        logger.warning(f"Shared memory lease leaked (taken at {origin}); reclaiming segment {segment.name}")
+        metrics.increment("shm_leases_leaked")
+        self._give_back(segment)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leased": self._leased,
+                "idle_segments": sum(len(free) for free in self._free.values()),
+                "idle_bytes": self._idle_bytes,
+            }
+
+    def close(self) -> None:
+        """Unlinks the idle segments; segments still leased are unlinked when released."""
+        with self._lock:
+            self._closed = True
+            idle = [segment for free in self._free.values() for segment in free]
+            self._free.clear()
+            self._idle_bytes = 0
+            leased = self._leased
+        for segment in idle:
+            _destroy(segment)
+        if leased:
+            logger.warning(f"Segment pool closed with {leased} lease(s) outstanding")
+
+
+def _caller() -> str:
+    # Frame 0 is _caller, 1 is SegmentPool.lease, 2 is whoever asked for the lease
+    frame = sys._getframe(2)
+    return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+
+
+_pool: Optional[SegmentPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_segment_pool() -> SegmentPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SegmentPool(settings.IMAGE_SHM_MAX_IDLE_MB * 1024 * 1024)
+        return _pool
+
+
+def close_segment_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+# --- File access ---
+
+class SegmentFull(OSError):
+    """A write would run past the end of the segment."""
+
+
+class SegmentFile(io.RawIOBase):
+    """
+    Seekable, readable and writable file over a buffer (a segment's memory),
+    like BytesIO but without copying. Its length is what has been written
+    (or `size` for a buffer that already holds data). Writing past the end of
+    the buffer raises SegmentFull.
+    """
+
+    def __init__(self, buffer, size: int = 0):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+        self.size = size
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        # One copy straight out of the segment (RawIOBase.read would go through a bytearray)
+        end = self.size if size is None or size < 0 else min(self.size, self._pos + size)
+        data = bytes(self._view[self._pos:end]) if end > self._pos else b""
+        self._pos += len(data)
+        return data
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), self.size - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def write(self, b) -> int:
+        with memoryview(b) as data:
+            n = data.nbytes
+            end = self._pos + n
+            if end > len(self._view):
+                raise SegmentFull(f"Write of {n} bytes at {self._pos} exceeds the {len(self._view)} byte segment.")
+            if self._pos > self.size:
+                # Like a file: the gap left by seeking past the end reads as zeros
+                self._view[self.size:self._pos] = bytes(self._pos - self.size)
+            self._view[self._pos:end] = data.cast("B")
+        self._pos = end
+        self.size = max(self.size, end)
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position.")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        self.size = self._pos if size is None else min(size, self.size)
+        return self.size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+# --- Decoded pixel buffers ---
+
+class PixelSpec(NamedTuple):
+    """Layout of a decoded image in a segment (picklable)."""
+    segment: SegmentRef
+    mode: str
+    width: int
+    height: int
+
+
+# Modes Pillow can wrap around an existing buffer without copying (Image.frombuffer).
+# Not "P": the palette is not part of the pixel buffer, so palette images are expanded.
+ZERO_COPY_MODES = ("L", "RGBA", "RGBX", "CMYK", "I", "F")
+
+
+def share_pixels(pool: SegmentPool, image) -> tuple[Lease, PixelSpec]:
+    """
+    Copies `image`'s pixels into a new lease. Other modes are converted so
+    they can be mapped zero-copy: RGBA if they have alpha or transparency
+    (e.g. PA, LA), RGBX otherwise (e.g. RGB, P).
+    """
+    if image.mode not in ZERO_COPY_MODES:
+        image = image.convert("RGBA" if "A" in image.mode or "transparency" in image.info else "RGBX")
+    pixels = image.tobytes()
+    lease = pool.lease(len(pixels))
+    lease.write(pixels)
+    return lease, PixelSpec(lease.ref(), image.mode, image.width, image.height)
+
+
+def attach_pixels(buffer, spec: PixelSpec):
+    """Wraps a shared pixel buffer as a Pillow image. The image reads the segment directly."""
+    from PIL import Image
+
+    return Image.frombuffer(spec.mode, (spec.width, spec.height), buffer, "raw", spec.mode, 0, 1)
@@ -0,0 +1,182 @@
+# app/core/singleflight.py
+
+"""
+Single-flight coalescing of identical concurrent requests.
+
+Within a worker, the first caller for a key starts the work in a task and every
+concurrent duplicate awaits that same task. Across workers, the first one to take a
+short-lived Redis lock does the work and hands the result to the others
+through a short-lived Redis key; if Redis is unavailable each worker simply
+computes on its own.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger("app")
+
+# Compare-and-delete so a worker never releases a lock it no longer owns
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_binary_redis: Optional[redis.Redis] = None
+
+
+def _get_binary_redis() -> redis.Redis:
+    """Shared client without decode_responses: results are raw bytes (e.g. encoded images)."""
+    global _binary_redis
+    if _binary_redis is None:
+        _binary_redis = redis.from_url(settings.REDIS_URL)
+    return _binary_redis
+
+
+class _Flight:
+    """One in-progress execution and the number of callers waiting for it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+async def _outlive(task: asyncio.Task) -> None:
+    """Waits for `task` to end, ignoring cancellation of the current task (it is re-raised by the caller)."""
+    while not task.done():
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            pass
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key. `name` namespaces the Redis
+    keys and the metric: `singleflight_<name>_coalesced` counts every request
+    that reused another request's result instead of doing the work itself.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lock_ttl_ms: int = 10_000,
+        result_ttl_seconds: int = 5,
+        max_shared_result_bytes: int = 8 * 1024 * 1024,
+    ):
+        self.name = name
+        self.lock_ttl_ms = lock_ttl_ms
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_shared_result_bytes = max_shared_result_bytes
+        self._inflight: Dict[str, _Flight] = {}
+
+    def _coalesced(self, scope: str) -> None:
+        metrics.increment(f"singleflight_{self.name}_coalesced")
+        metrics.increment(f"singleflight_{self.name}_coalesced_{scope}")
+
+    async def do(self, key: str, work: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        Returns `work()`'s result, running it at most once per key at a time.
+
+        The work runs in its own task, so a caller that is cancelled (e.g. its
+        client disconnected) does not cancel it for the duplicates still
+        waiting; it is only cancelled once nobody waits for it. `work` may use
+        resources of the caller that started the flight (its upload), so that
+        caller stays until the work ends when others are still waiting.
+        """
+        flight = self._inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight(asyncio.create_task(self._run_across_workers(key, work)))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(functools.partial(self._finished, key, flight))
+        else:
+            self._coalesced("local")
+
+        flight.waiters += 1
+        try:
+            # shield: a cancelled caller must not cancel the shared work
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.task.done():
+                # Only reached when this caller was cancelled
+                if flight.waiters == 0:
+                    flight.task.cancel()
+                elif leader:
+                    await _outlive(flight.task)
+
+    def _finished(self, key: str, flight: "_Flight", task: asyncio.Task) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter had gone
+            task.exception()
+
+    async def _run_across_workers(self, key: str, work: Callable[[], Awaitable[bytes]]) -> bytes:
+        lock_key = f"singleflight:{self.name}:{key}:lock"
+        result_key = f"singleflight:{self.name}:{key}:result"
+        client = _get_binary_redis()
+        token = uuid.uuid4().hex
+
+        try:
+            # A worker that finished a moment ago may have left its result behind
+            shared = await client.get(result_key)
+            if shared is not None:
+                self._coalesced("remote")
+                return shared
+            if await client.set(lock_key, token, nx=True, px=self.lock_ttl_ms):
+                return await self._run_and_publish(client, lock_key, result_key, token, work)
+            shared = await self._wait_for_result(client, lock_key, result_key)
+        except RedisError as e:
+            logger.warning(f"Single-flight coordination unavailable, computing locally: {e}")
+            return await work()
+
+        if shared is not None:
+            self._coalesced("remote")
+            return shared
+        # The other worker failed, timed out or its result was too large to share
+        return await work()
+
+    async def _run_and_publish(self, client, lock_key: str, result_key: str, token: str, work) -> bytes:
+        try:
+            result = await work()
+            if len(result) <= self.max_shared_result_bytes:
+                try:
+                    await client.set(result_key, result, ex=self.result_ttl_seconds)
+                except RedisError as e:
+                    logger.warning(f"Could not share single-flight result: {e}")
+            return result
+        finally:
+            try:
+                await client.eval(_RELEASE_LOCK, 1, lock_key, token)
+            except RedisError:
+                pass  # The lock expires on its own
+
+    async def _wait_for_result(self, client, lock_key: str, result_key: str) -> Optional[bytes]:
+        """Polls for another worker's result while it still holds the lock."""
+        deadline = time.monotonic() + self.lock_ttl_ms / 1000
+        delay = 0.01
+        while time.monotonic() < deadline:
+            shared = await client.get(result_key)
+            if shared is not None:
+                return shared
+            if not await client.exists(lock_key):
+                # Lock released: the result may have been written just before
+                return await client.get(result_key)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+        return None
@@ -0,0 +1,153 @@
+# app/core/uploads.py
+
+import io
+import mmap
+import os
+import tempfile
+from typing import BinaryIO, Optional, Union
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
+
+from app.core.config import settings
+
+MB = 1024 * 1024
+# Size of the pieces copied from the incoming UploadFile into our spool
+CHUNK_SIZE = 64 * 1024
+
+# Read-only, zero-copy view over the upload contents. Both types support the
+# buffer protocol (base64, hashlib, zlib...) and slicing.
+UploadView = Union[memoryview, mmap.mmap]
+
+
+class SpooledUpload:
+    """
+    An uploaded file kept in memory up to `spool_max_size` bytes and in a
+    temporary file above it.
+
+    Consumers read it through `view()` (memoryview / mmap, no `bytes` copy)
+    or `open()` (a seekable file object for libraries like Pillow).
+    Use it as a context manager so the view and temp file are released.
+    """
+
+    def __init__(
+        self,
+        filename: Optional[str],
+        content_type: Optional[str],
+        spool_max_size: int,
+        file: Optional[BinaryIO] = None,
+        size: int = 0,
+    ):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self._spool_max_size = spool_max_size
+        # An adopted file is already on disk and is owned (closed) by someone else
+        self._owns_file = file is None
+        self._file: BinaryIO = file if file is not None else io.BytesIO()
+        self._on_disk = file is not None
+        self._view: Optional[UploadView] = None
+
+    @classmethod
+    def from_path(cls, path: str, filename: Optional[str], content_type: Optional[str]) -> "SpooledUpload":
+        """Wraps a file that is already on disk (e.g. a finished resumable upload)."""
+        file = open(path, "rb")
+        upload = cls(filename, content_type, 0, file=file, size=os.fstat(file.fileno()).st_size)
+        upload._owns_file = True
+        return upload
+
+    @property
+    def on_disk(self) -> bool:
+        return self._on_disk
+
+    def write(self, chunk: bytes) -> None:
+        """Appends a chunk, moving the contents to disk once the spool limit is crossed."""
+        if not self._on_disk and self.size + len(chunk) > self._spool_max_size:
+            self._rollover()
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def _rollover(self) -> None:
+        disk_file = tempfile.TemporaryFile()
+        disk_file.write(self._file.getbuffer())
+        self._file.close()
+        self._file = disk_file
+        self._on_disk = True
+
+    def view(self) -> UploadView:
+        """Returns a read-only view of the contents (mmap on disk, memoryview in memory)."""
+        if self._view is None:
+            if self.size == 0:
+                self._view = memoryview(b"")
+            elif self._on_disk:
+                self._file.flush()
+                self._view = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._view = self._file.getbuffer().toreadonly()
+        return self._view
+
+    def open(self) -> BinaryIO:
+        """Returns a seekable file object positioned at the start of the contents."""
+        if self._on_disk:
+            stream = self.view()
+            if isinstance(stream, mmap.mmap):
+                stream.seek(0)
+                return stream
+        self._file.seek(0)
+        return self._file
+
+    def close(self) -> None:
+        if self._view is not None:
+            if isinstance(self._view, mmap.mmap):
+                self._view.close()
+            else:
+                self._view.release()
+            self._view = None
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def payload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds the {max_bytes // MB} MB limit for this endpoint.",
+    )
+
+
+async def spool_upload(file: UploadFile, max_bytes: int) -> SpooledUpload:
+    """
+    Moves an UploadFile into a SpooledUpload without ever holding it fully in memory.
+
+    Starlette already writes multipart parts larger than its own spool size to a
+    temp file; those are adopted as-is (zero copy). Smaller parts are copied in
+    CHUNK_SIZE pieces into a spool that honours UPLOAD_SPOOL_MAX_KB.
+    Raises 413 if the upload is larger than `max_bytes`.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise payload_too_large(max_bytes)
+
+    if file.size is not None and file.size > MultiPartParser.spool_max_size:
+        # Already rolled over to disk by the multipart parser
+        return SpooledUpload(file.filename, file.content_type, 0, file=file.file, size=file.size)
+
+    upload = SpooledUpload(file.filename, file.content_type, settings.UPLOAD_SPOOL_MAX_KB * 1024)
+    try:
+        await file.seek(0)
+        while chunk := await file.read(CHUNK_SIZE):
+            if upload.size + len(chunk) > max_bytes:
+                raise payload_too_large(max_bytes)
+            if upload.on_disk:
+                await run_in_threadpool(upload.write, chunk)
+            else:
+                upload.write(chunk)
+    except BaseException:
+        upload.close()
+        raise
+    return upload
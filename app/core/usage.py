@@ -0,0 +1,202 @@
+# app/core/usage.py
+
+"""
+Write-behind per-user usage accounting and daily quotas.
+
+Every metered request adds to a Redis hash `usage:{user_id}:{day}` (bytes,
+pixels, requests) in one MULTI/EXEC pipeline and marks it dirty. Quotas are
+checked against the totals that pipeline returns, so they hold across all
+workers. A background loop scans the dirty entries in batches and upserts
+their *absolute* daily totals into the `usage` table: re-flushing is
+idempotent and concurrent flushers on different workers cannot double count.
+An entry leaves the dirty set only after its upsert committed, and only if it
+was not charged again in the meantime, so a failed write or a crashed worker
+just leaves it for the next flush.
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger("app")
+
+DIRTY_KEY = "usage:dirty"
+# Daily hashes outlive their day long enough for late flushes
+USAGE_KEY_TTL_SECONDS = 3 * 24 * 60 * 60
+MEGAPIXEL = 1_000_000
+
+
+# Clears dirty entries whose totals are still the ones just written; entries
+# charged again since they were read stay dirty. ARGV: entry, bytes, pixels, requests, ...
+_CLEAR_FLUSHED = """
+for i = 1, #ARGV, 4 do
+    local current = redis.call("HMGET", "usage:" .. ARGV[i], "bytes", "pixels", "requests")
+    local expired = not current[1] and not current[2] and not current[3]
+    if expired or (current[1] == ARGV[i + 1] and current[2] == ARGV[i + 2] and current[3] == ARGV[i + 3]) then
+        redis.call("SREM", KEYS[1], ARGV[i])
+    end
+end
+return 0
+"""
+
+
+def usage_key(entry: str) -> str:
+    """`entry` is "{user_id}:{day}", the member stored in the dirty set."""
+    return f"usage:{entry}"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _seconds_until_tomorrow() -> int:
+    now = datetime.now(timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return max(1, int((tomorrow - now).total_seconds()))
+
+
+def _exceeded_quota(total_bytes: int, total_pixels: int) -> Optional[str]:
+    bytes_quota = settings.USAGE_DAILY_BYTES_QUOTA_MB * 1024 * 1024
+    pixels_quota = settings.USAGE_DAILY_MEGAPIXELS_QUOTA * MEGAPIXEL
+    if bytes_quota and total_bytes > bytes_quota:
+        return f"{settings.USAGE_DAILY_BYTES_QUOTA_MB} MB"
+    if pixels_quota and total_pixels > pixels_quota:
+        return f"{settings.USAGE_DAILY_MEGAPIXELS_QUOTA} megapixel"
+    return None
+
+
+class UsageMeter:
+    """Charges the current user's daily usage (see `get_usage_meter` in app/core/dependencies.py)."""
+
+    def __init__(self, redis_client: redis.Redis, user_id: str):
+        self.redis = redis_client
+        self.user_id = user_id
+
+    async def charge(self, bytes_processed: int = 0, pixels: int = 0) -> None:
+        """
+        Adds this request's usage, or raises 429 if it would exceed a daily quota
+        (the rejected request is not counted). If Redis is unreachable the
+        request is let through unmetered rather than failing the tool.
+        """
+        if bytes_processed < 0 or pixels < 0:
+            # A negative charge would lower the day's totals
+            raise ValueError("Usage cannot be negative.")
+        entry = f"{self.user_id}:{_today().isoformat()}"
+        key = usage_key(entry)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hincrby(key, "bytes", bytes_processed)
+                pipe.hincrby(key, "pixels", pixels)
+                pipe.hincrby(key, "requests", 1)
+                pipe.expire(key, USAGE_KEY_TTL_SECONDS)
+                pipe.sadd(DIRTY_KEY, entry)
+                total_bytes, total_pixels, *_ = await pipe.execute()
+
+            exceeded = _exceeded_quota(total_bytes, total_pixels)
+            if exceeded is None:
+                return
+            # Hand the reservation back so only accepted work counts
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hincrby(key, "bytes", -bytes_processed)
+                pipe.hincrby(key, "pixels", -pixels)
+                pipe.hincrby(key, "requests", -1)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Usage accounting unavailable, request not metered: {e}")
+            return
+
+        metrics.increment("usage_quota_rejections")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Daily {exceeded} quota exceeded.",
+            headers={"Retry-After": str(_seconds_until_tomorrow())},
+        )
+
+
+# --- Write-behind flush ---
+
+def _upsert_usage(rows: list[dict]) -> None:
+    """Batched upsert of absolute daily totals (runs in a worker thread)."""
+    from sqlalchemy import func
+    from sqlalchemy.dialects.postgresql import insert
+
+    from app.db.database import SessionLocal
+    from app.db.models import Usage
+
+    statement = insert(Usage).values(rows)
+    excluded = statement.excluded
+    # GREATEST keeps a stale or out-of-order flush from lowering a total
+    statement = statement.on_conflict_do_update(
+        index_elements=[Usage.user_id, Usage.day],
+        set_={
+            "bytes_processed": func.greatest(Usage.bytes_processed, excluded.bytes_processed),
+            "pixels_processed": func.greatest(Usage.pixels_processed, excluded.pixels_processed),
+            "requests": func.greatest(Usage.requests, excluded.requests),
+            "updated_at": func.now(),
+        },
+    )
+    with SessionLocal() as db:
+        db.execute(statement)
+        db.commit()
+
+
+async def flush_usage(redis_client: redis.Redis) -> int:
+    """Writes all dirty daily totals to Postgres in batches. Returns the number of rows written."""
+    flushed = 0
+    cursor = 0
+    while True:
+        # SSCAN leaves the entries in the dirty set: they are only cleared after the upsert commits
+        cursor, entries = await redis_client.sscan(DIRTY_KEY, cursor, count=settings.USAGE_FLUSH_BATCH_SIZE)
+        entries = list(dict.fromkeys(entries))  # SSCAN may return an entry twice
+        if entries:
+            flushed += await _flush_batch(redis_client, entries)
+        if cursor == 0:
+            return flushed
+
+
+async def _flush_batch(redis_client: redis.Redis, entries: list[str]) -> int:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for entry in entries:
+            pipe.hgetall(usage_key(entry))
+        totals = await pipe.execute()
+
+    rows = []
+    flushed_values = []
+    for entry, values in zip(entries, totals):
+        flushed_values += [entry, values.get("bytes", ""), values.get("pixels", ""), values.get("requests", "")]
+        if not values:
+            continue  # Expired before it was flushed
+        user_id, _, day = entry.rpartition(":")
+        rows.append({
+            "user_id": user_id,
+            "day": date.fromisoformat(day),
+            "bytes_processed": int(values.get("bytes", 0)),
+            "pixels_processed": int(values.get("pixels", 0)),
+            "requests": int(values.get("requests", 0)),
+        })
+
+    if rows:
+        # On failure the entries simply stay dirty for the next flush
+        await run_in_threadpool(_upsert_usage, rows)
+    await redis_client.eval(_CLEAR_FLUSHED, 1, DIRTY_KEY, *flushed_values)
+    metrics.increment("usage_rows_flushed", len(rows))
+    return len(rows)
+
+
+async def flush_loop(redis_client: redis.Redis) -> None:
+    """Periodically flushes usage counters to Postgres (started from the app lifespan)."""
+    while True:
+        await asyncio.sleep(settings.USAGE_FLUSH_INTERVAL_SECONDS)
+        try:
+            await flush_usage(redis_client)
+        except Exception as e:
+            logger.error(f"Usage flush failed: {e}")
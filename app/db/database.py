@@ -1,20 +1,39 @@
+from typing import Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-# Create the SQLAlchemy engine
-engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URL
-)
-# Configure a SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The engine is created in the application lifespan (see app/main.py) instead of
+# at import time, so importing the app does not load the DB driver or build a pool.
+engine: Optional[Engine] = None
+
+# Configure a SessionLocal class (bound to the engine by init_engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 # Base class for our models to inherit from
 Base = declarative_base()
 
+def init_engine() -> Engine:
+    """Creates the SQLAlchemy engine once and binds SessionLocal to it."""
+    global engine
+    if engine is None:
+        engine = create_engine(
+            settings.SQLALCHEMY_DATABASE_URL
+        )
+        SessionLocal.configure(bind=engine)
+    return engine
+
+def dispose_engine() -> None:
+    """Closes all pooled connections (called on application shutdown)."""
+    global engine
+    if engine is not None:
+        engine.dispose()
+        engine = None
+
 def create_db_tables():
     """Function to create all tables defined in Base.metadata"""
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Tables created.")
\ No newline at end of file
+    Base.metadata.create_all(bind=init_engine())
+    print("Tables created.")
@@ -1,6 +1,6 @@
 # app/db/models.py
 
-from sqlalchemy import Column, String, Boolean
+from sqlalchemy import BigInteger, Column, Date, DateTime, Index, Integer, String, Boolean, func
 from sqlalchemy.dialects.postgresql import UUID # Import UUID type for Postgres
 from app.db.database import Base
 import uuid # For generating default UUIDs
@@ -8,12 +8,38 @@ import uuid # For generating default UUIDs
 class User(Base):
     __tablename__ = "users"
 
-    # Changed from Integer to UUID as Primary Key
-    id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    # Changed from Integer to UUID as Primary Key (the PK is already indexed)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
-    email = Column(String, unique=True, index=True, nullable=False)
+    # Unique case-insensitively, see __table_args__
+    email = Column(String, nullable=False)
     # Hashed password for Basic Auth. Null for SSO users.
     hashed_password = Column(String, nullable=True) 
     is_active = Column(Boolean, default=True)
     # 'Basic' or 'SSO'
-    auth_method = Column(String, default="Basic", nullable=False)
\ No newline at end of file
+    auth_method = Column(String, default="Basic", nullable=False)
+
+    __table_args__ = (
+        # Emails are matched on lower(email). INCLUDE puts every column the auth
+        # lookups read into the index, so logins are index-only scans.
+        Index(
+            "ix_users_email_lower",
+            func.lower(email),
+            unique=True,
+            postgresql_include=["id", "email", "hashed_password", "is_active", "auth_method"],
+        ),
+    )
+
+
+class Usage(Base):
+    """Daily per-user tool usage, written behind from the Redis counters (app/core/usage.py)."""
+    __tablename__ = "usage"
+
+    # No foreign key to users: a flush must never fail because a user was removed
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    bytes_processed = Column(BigInteger, nullable=False, default=0)
+    pixels_processed = Column(BigInteger, nullable=False, default=0)
+    requests = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,64 @@
+# app/db/queries.py
+
+"""
+Statements for the auth hot path.
+
+They select only the columns auth needs (no ORM identity map or attribute
+instrumentation) and are built once at import, so SQLAlchemy's compiled cache
+is hit on every call. Emails are compared on lower(email), which is served by
+the covering ix_users_email_lower index.
+"""
+
+import uuid
+from typing import Optional
+
+from sqlalchemy import Row, bindparam, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.models import User
+
+# Rows returned here have the attributes `id`, `email`, `hashed_password`,
+# `is_active` and `auth_method`, like a User object.
+AUTH_COLUMNS = (User.id, User.email, User.hashed_password, User.is_active, User.auth_method)
+EMAIL_KEY = func.lower(User.email)
+
+_select_by_email = select(*AUTH_COLUMNS).where(EMAIL_KEY == func.lower(bindparam("email")))
+
+_insert_basic_user = (
+    insert(User)
+    .values(id=bindparam("id"), email=bindparam("email"), hashed_password=bindparam("hashed_password"),
+            auth_method="Basic", is_active=True)
+    .on_conflict_do_nothing(index_elements=[EMAIL_KEY])
+    .returning(User.id)
+)
+
+# DO NOTHING returns no row for an existing user (who is then read with _select_by_email),
+# but never rewrites or locks that user's row on every SSO login
+_insert_sso_user = (
+    insert(User)
+    .values(id=bindparam("id"), email=bindparam("email"), hashed_password=None, auth_method="SSO", is_active=True)
+    .on_conflict_do_nothing(index_elements=[EMAIL_KEY])
+    .returning(*AUTH_COLUMNS)
+)
+
+
+def get_auth_user(db: Session, email: str) -> Optional[Row]:
+    """The auth columns of the user with this email (case-insensitive), or None."""
+    return db.execute(_select_by_email, {"email": email}).first()
+
+
+def create_basic_user(db: Session, email: str, hashed_password: str) -> bool:
+    """Inserts a Basic Auth user; False if the email is already registered."""
+    created = db.execute(_insert_basic_user, {"id": uuid.uuid4(), "email": email, "hashed_password": hashed_password}).first()
+    db.commit()
+    return created is not None
+
+
+def get_or_create_sso_user(db: Session, email: str) -> Row:
+    """Returns the user with this email, creating an SSO user on first login."""
+    user = db.execute(_insert_sso_user, {"id": uuid.uuid4(), "email": email}).first()
+    if user is None:
+        user = get_auth_user(db, email)
+    db.commit()
+    return user
@@ -1,17 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import auth, file_tools, image_tools, status
+from app.api import admin, auth, file_tools, image_tools, status, uploads
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.middleware import ConcurrencyLimitMiddleware, ResponseCompressionMiddleware, UploadSizeLimitMiddleware
+from app.core.concurrency import ROUTE_CLASS_LIMITS, AdaptiveLimiter
+from app.core.uploads import MB
 from fastapi_limiter import FastAPILimiter
 from app.core.dependencies import get_redis_client
+from app.core.redis_client import close_client
+from app.db.database import init_engine, dispose_engine
+from app.core.resumable import cleanup_loop
+from app.core.usage import flush_loop, flush_usage
+from app.core.oauth import close_http_client, open_http_client
+from app.core.sessions import revocation_listener
+from app.core.image_workers import shutdown_image_workers
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 1. Create the SQLAlchemy engine (deferred from import time to keep startup fast)
+    init_engine()
+
+    # 2. Create the shared async Redis client (requests reuse it through get_redis_client)
+    redis_client = get_redis_client()
+    # 3. Test the connection
+    try:
+        await redis_client.ping()
+        print("✅ Redis connection established and PONG received.")
+    except Exception as e:
+        print(f"❌ Redis connection failed: {e}")
+
+    # 4. Initialize the FastAPILimiter with the client
+    await FastAPILimiter.init(redis_client)
+
+    # 5. Periodically delete resumable upload files whose session expired
+    cleanup_task = asyncio.create_task(cleanup_loop(redis_client))
+
+    # 6. Write per-user usage counters behind to Postgres
+    usage_task = asyncio.create_task(flush_loop(redis_client))
+
+    # 7. Pooled HTTP client for the Google SSO token exchange / key fetches
+    open_http_client()
+
+    # 8. Keep this worker's revoked-session filter in sync with the other workers
+    revocation_task = asyncio.create_task(revocation_listener(redis_client))
+
+    yield
+
+    cleanup_task.cancel()
+    usage_task.cancel()
+    revocation_task.cancel()
+    # Final flush so a clean shutdown loses nothing
+    try:
+        await flush_usage(redis_client)
+    except Exception as e:
+        print(f"❌ Final usage flush failed: {e}")
+    # Image processes (if enabled) and their shared memory segments
+    shutdown_image_workers()
+    await close_http_client()
+    await FastAPILimiter.close()
+    await close_client()
+    dispose_engine()
 
 # Initialize FastAPI application
 app = FastAPI(
     title="Day-to-Day Utility Backend",
     description="Backend for file and image processing tools with JWT security.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Reject oversized uploads early (413) instead of tying up a worker reading them
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/tools/files": settings.MAX_FILE_UPLOAD_MB * MB,
+        "/tools/files/hash": settings.MAX_HASH_UPLOAD_MB * MB,
+        "/tools/images": settings.MAX_IMAGE_UPLOAD_MB * MB,
+        "/tools/uploads": settings.MAX_UPLOAD_CHUNK_MB * MB,
+        "/admin": settings.MAX_IMPORT_UPLOAD_MB * MB,
+    },
+)
+
+# Compress responses (Base64 / JSON payloads) with brotli, zstd or gzip as negotiated
+app.add_middleware(
+    ResponseCompressionMiddleware,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+    thread_threshold=settings.RESPONSE_COMPRESSION_THREAD_BYTES,
+)
+
+# Per route class concurrency limits: under overload image traffic is throttled
+# (503 + Retry-After) while logins, token refresh and health checks stay fast.
+# Outside the other middleware (only CORS wraps it) so it sheds before any other work.
+if settings.LOAD_SHEDDING_ENABLED:
+    app.add_middleware(
+        ConcurrencyLimitMiddleware,
+        route_classes={
+            "/auth": "auth",
+            "/tools/images": "image",
+            "/tools/files": "file",
+            "/tools/uploads": "file",
+            "/status": "monitoring",
+            "/admin": "admin",
+        },
+        limiters={name: AdaptiveLimiter(name, config) for name, config in ROUTE_CLASS_LIMITS.items()},
+    )
+
+# Added last so CORS is the outermost middleware: early 503s and 413s from the
+# middleware above still carry the CORS headers browsers need to read them
 origins = settings.CORS_ALLOWED_ORIGINS.split(',') if settings.CORS_ALLOWED_ORIGINS else []
 app.add_middleware(
     CORSMiddleware,
@@ -21,28 +118,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.on_event("startup")
-async def startup():
-    # 1. Create the async Redis client instance from the connection URL
-    redis_client = get_redis_client() 
-    # 2. Test the connection
-    try:
-        await redis_client.ping()
-        print("✅ Redis connection established and PONG received.")
-    except Exception as e:
-        print(f"❌ Redis connection failed: {e}")
-        
-    # 3. Initialize the FastAPILimiter with the client
-    await FastAPILimiter.init(redis_client)
-
-
-
 # Include all the API routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(file_tools.router, prefix="/tools/files", tags=["File & Base64"])
 app.include_router(image_tools.router, prefix="/tools/images", tags=["Image Processing"])
+app.include_router(uploads.router, prefix="/tools/uploads", tags=["Resumable Uploads"])
 app.include_router(status.router, prefix="/status", tags=["Monitoring"])
+app.include_router(admin.router, prefix="/admin", tags=["Administration"])
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Utility API. Navigate to /docs for interactive documentation."}
\ No newline at end of file
+    return {"message": "Welcome to the Utility API. Navigate to /docs for interactive documentation."}
@@ -4,9 +4,16 @@ from pydantic import BaseModel, ConfigDict
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    # Exchange at /auth/token/refresh for a new pair; each refresh token works once
+    refresh_token: str | None = None
+    # Access token lifetime in seconds
+    expires_in: int | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
 class TokenData(BaseModel):
     username: str | None = None
     model_config = ConfigDict(from_attributes=True)
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
@@ -0,0 +1,17 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+class UploadCreate(BaseModel):
+    filename: str = Field(..., max_length=255)
+    content_type: str = "application/octet-stream"
+    # Total size in bytes, announced up front (like tus "Upload-Length")
+    length: int = Field(..., gt=0)
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    content_type: str
+    offset: int
+    length: int
+    expires_in: int
+
+    model_config = ConfigDict(from_attributes=True)
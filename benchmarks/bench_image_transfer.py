@@ -0,0 +1,154 @@
+"""
+Image transfer benchmark: shared memory segments vs pickling between the API
+worker and an image process (IMAGE_PROCESS_WORKERS > 0, see app/core/image_workers.py).
+
+Three cases, each timed both ways on the same spawned process pool:
+
+- copy:   the image process copies the upload to its output, so the time is
+          almost all transfer (upload in, result of the same size out).
+- resize: a real `resize_image` of a generated JPEG of about the same size.
+- pixels: a decoded RGBA image is handed over and the process reads it;
+          pickled (Image.tobytes) vs share_pixels/attach_pixels.
+
+Run from the project root:
+
+    python benchmarks/bench_image_transfer.py --sizes 1 8 32 --runs 20
+"""
+
+import argparse
+import asyncio
+import io
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+
+settings.IMAGE_PROCESS_WORKERS = 1
+
+from app.api.image_tools import resize_image  # noqa: E402
+from app.core import image_workers  # noqa: E402
+from app.core.shm import PixelSpec, attach_pixels, get_segment_pool, share_pixels  # noqa: E402
+from app.core.uploads import SpooledUpload  # noqa: E402
+
+MB = 1024 * 1024
+
+
+# --- Image process side (module level so the spawned process can import them) ---
+
+class _BytesUpload:
+    """Upload stand-in for the pickled path: the bytes travelled through the pipe."""
+
+    def __init__(self, data: bytes):
+        self.size = len(data)
+        self._data = data
+
+    def open(self):
+        return io.BytesIO(self._data)
+
+
+def copy_operation(upload, out=None):
+    out = out if out is not None else io.BytesIO()
+    source = upload.open()
+    while chunk := source.read(MB):
+        out.write(chunk)
+    return out
+
+
+def pickled_job(operation, data: bytes, args: tuple) -> bytes:
+    return operation(_BytesUpload(data), *args).getvalue()
+
+
+def read_pickled_pixels(image) -> tuple:
+    return image.getpixel((0, 0))
+
+
+def read_shared_pixels(spec: PixelSpec) -> tuple:
+    buffer = image_workers._attach(spec.segment.name)
+    return attach_pixels(buffer, spec).getpixel((0, 0))
+
+
+# --- API worker side ---
+
+def make_upload(data: bytes) -> SpooledUpload:
+    upload = SpooledUpload("bench", "image/jpeg", len(data) + 1)
+    upload.write(data)
+    return upload
+
+
+def make_jpeg(size_mb: int) -> bytes:
+    """Noisy JPEG of roughly `size_mb` (noise keeps it from compressing away)."""
+    from PIL import Image
+
+    side = int(math.sqrt(size_mb * MB / 1.5))
+    image = Image.effect_noise((side, side), 64).convert("RGB")
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=95)
+    return out.getvalue()
+
+
+async def time_async(runs: int, call) -> float:
+    await call()  # Warm up: segment allocation, attaching, imports in the image process
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def report(case: str, size: str, pickled: float, shared: float) -> None:
+    print(f"{case:<7} {size:>9}  pickle {pickled * 1000:8.2f}ms  shm {shared * 1000:8.2f}ms  speedup {pickled / shared:5.2f}x")
+
+
+async def bench(sizes: list[int], runs: int) -> None:
+    from PIL import Image
+
+    loop = asyncio.get_running_loop()
+    executor = image_workers._get_executor()
+
+    for size_mb in sizes:
+        data = os.urandom(size_mb * MB)
+        upload = make_upload(data)
+        pickled = await time_async(runs, lambda: loop.run_in_executor(executor, pickled_job, copy_operation, data, ()))
+        shared = await time_async(runs, lambda: image_workers.run_in_image_process(copy_operation, upload, len(data)))
+        report("copy", f"{size_mb} MB", pickled, shared)
+
+        jpeg = make_jpeg(size_mb)
+        upload = make_upload(jpeg)
+        args = (400, 400, 80, 1)
+        pickled = await time_async(runs, lambda: loop.run_in_executor(executor, pickled_job, resize_image, jpeg, args))
+        shared = await time_async(runs, lambda: image_workers.run_in_image_process(resize_image, upload, 400 * 400 * 4, *args))
+        report("resize", f"{len(jpeg) / MB:.1f} MB", pickled, shared)
+
+        side = int(math.sqrt(size_mb * MB / 4))
+        image = Image.new("RGBA", (side, side), (10, 20, 30, 255))
+
+        async def shared_pixels():
+            lease, spec = share_pixels(get_segment_pool(), image)
+            with lease:
+                return await loop.run_in_executor(executor, read_shared_pixels, spec)
+
+        pickled = await time_async(runs, lambda: loop.run_in_executor(executor, read_pickled_pixels, image))
+        shared = await time_async(runs, shared_pixels)
+        report("pixels", f"{side}x{side}", pickled, shared)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 32], help="Payload sizes in MB")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per case (median is reported)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(bench(args.sizes, args.runs))
+    finally:
+        image_workers.shutdown_image_workers()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
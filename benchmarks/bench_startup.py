@@ -0,0 +1,87 @@
+"""
+Startup benchmark: measures how long `import app.main` takes in a fresh interpreter.
+
+Each run spawns `python -X importtime -c "import app.main"`, so the numbers include
+everything a new worker pays before it can serve traffic. Run from the project root
+(the usual .env is picked up by Settings):
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --check   # fail if a lazy dependency is imported eagerly
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Heavy dependencies that must only be imported on first use (see app/core/security.py,
+# app/api/auth.py and app/api/image_tools.py).
+LAZY_MODULES = ("PIL", "passlib", "jose", "httpx", "psycopg2")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(module: str) -> tuple[float, str]:
+    """Imports `module` in a fresh interpreter and returns (wall seconds, importtime log)."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, proc.stderr
+
+
+def parse_importtime(log: str) -> dict[str, int]:
+    """Returns {module: cumulative microseconds} from a `-X importtime` log."""
+    cumulative = {}
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # Format: "import time: <self us> | <cumulative us> | <indent><module>"
+        _, cumulative_us, name = line.split("|", 2)
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="Module to import (default: app.main)")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to list")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any LAZY_MODULES are imported")
+    args = parser.parse_args()
+
+    timings = []
+    log = ""
+    for _ in range(args.runs):
+        elapsed, log = run_once(args.module)
+        timings.append(elapsed)
+
+    print(f"import {args.module}: runs={args.runs} "
+          f"median={statistics.median(timings) * 1000:.1f}ms "
+          f"min={min(timings) * 1000:.1f}ms max={max(timings) * 1000:.1f}ms")
+
+    # Only the last run's breakdown is shown; the first run also pays for .pyc compilation.
+    cumulative = parse_importtime(log)
+    print("\nSlowest top-level packages (cumulative, last run):")
+    top_level = {name: us for name, us in cumulative.items() if "." not in name}
+    for name, us in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"  {us / 1000:8.1f}ms  {name}")
+
+    eager = sorted({name.split(".")[0] for name in cumulative} & set(LAZY_MODULES))
+    if eager:
+        print(f"\n⚠️  Imported eagerly (should be lazy): {', '.join(eager)}")
+        return 1 if args.check else 0
+    print("\n✅ No lazy dependencies imported at startup.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
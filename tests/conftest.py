@@ -11,6 +11,8 @@ from sqlalchemy_utils import create_database, drop_database, database_exists
 from app.main import app
 from app.db.database import Base
 from app.core.dependencies import get_db
+from app.core.security import get_password_hash
+from app.db.queries import create_basic_user
 from app.core.config import settings
 
 # 1. Setup a Test Database URL
@@ -117,4 +119,14 @@ def client(test_db_session):
     """Fixture to provide a reusable FastAPI TestClient."""
     # The client uses the dependency override set by test_db_session
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+@pytest.fixture(scope="function")
+def auth_headers(client, test_db_session: Session) -> dict:
+    """Creates a throwaway user and returns a Bearer Authorization header for it."""
+    email, password = "tools-user@example.com", "securepassword123"
+    # Straight into the DB: /auth/basic/register is rate limited (5 per 10 seconds)
+    create_basic_user(test_db_session, email, get_password_hash(password))
+    response = client.post(f"/auth/basic/token?username={email}&password={password}")
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,54 @@
+# tests/test_admin.py
+
+import json
+from fastapi.testclient import TestClient
+from app.core.config import settings
+
+def test_bulk_import_requires_admin(client: TestClient, auth_headers: dict):
+    response = client.post(
+        "/admin/users/import",
+        files={"file": ("users.csv", b"email,password\nnew@example.com,pw\n", "text/csv")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 403
+
+def test_bulk_import_reports_each_row(client: TestClient, auth_headers: dict, monkeypatch):
+    """New users are created, existing/duplicate/invalid rows are reported and skipped."""
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "tools-user@example.com")
+    csv_data = (
+        "email,password\n"
+        "bulk-1@example.com,password-one\n"
+        "tools-user@example.com,already-there\n"
+        "bulk-1@example.com,repeated\n"
+        "not-an-email,password\n"
+    )
+
+    response = client.post(
+        "/admin/users/import",
+        files={"file": ("users.csv", csv_data.encode(), "text/csv")},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    statuses = {line["line"]: line["status"] for line in lines if "line" in line}
+    assert statuses == {2: "created", 3: "exists", 4: "duplicate", 5: "invalid"}
+    assert lines[-1] == {"summary": {"processed": 4, "created": 1, "skipped": 2, "invalid": 1}}
+
+    login = client.post("/auth/basic/token?username=bulk-1@example.com&password=password-one")
+    assert login.status_code == 200
+
+def test_bulk_import_body_is_size_limited(client: TestClient):
+    """The upload limit applies before authentication, so even a bogus request gets its 413."""
+    too_large = str(settings.MAX_IMPORT_UPLOAD_MB * 1024 * 1024 + 1)
+    response = client.post("/admin/users/import", content=b"", headers={"Content-Length": too_large})
+    assert response.status_code == 413
+
+def test_metrics_are_admin_only(client: TestClient, auth_headers: dict, monkeypatch):
+    assert client.get("/status/metrics").status_code == 401
+    assert client.get("/status/metrics", headers=auth_headers).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "tools-user@example.com")
+    response = client.get("/status/metrics", headers=auth_headers)
+    assert response.status_code == 200
+    assert set(response.json()) == {"counters", "gauges"}
@@ -69,4 +69,18 @@ def test_protected_route_unauthorized(client: TestClient):
     
     # Must fail with 401 Unauthorized
     assert response.status_code == 401
-    assert "Not authenticated" in response.json()['detail']
\ No newline at end of file
+    assert "Not authenticated" in response.json()['detail']
+
+
+def test_emails_are_case_insensitive(client: TestClient):
+    """Registering the same address in another case is rejected; login ignores case."""
+    password = "securepassword123"
+    first = client.post("/auth/basic/register", json={"email": "Mixed.Case@example.com", "password": password})
+    again = client.post("/auth/basic/register", json={"email": "mixed.case@example.com", "password": password})
+
+    assert first.status_code == 201
+    assert again.status_code == 400
+    assert again.json()["detail"] == "Email already registered"
+
+    login = client.post(f"/auth/basic/token?username=MIXED.CASE@example.com&password={password}")
+    assert login.status_code == 200
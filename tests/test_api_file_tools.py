@@ -0,0 +1,145 @@
+# tests/test_api_file_tools.py
+
+import hashlib
+import json
+import zlib
+import pytest
+from fastapi.testclient import TestClient
+
+def test_hash_files_returns_ndjson_per_file(client: TestClient, auth_headers: dict):
+    """All digests are computed in one pass and each file gets its own NDJSON line."""
+    big = b"abc" * 500_000
+    small = b"hello"
+
+    response = client.post(
+        "/tools/files/hash",
+        files=[("files", ("big.bin", big)), ("files", ("small.txt", small))],
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = {line["filename"]: line for line in map(json.loads, response.text.splitlines())}
+    for name, data in (("big.bin", big), ("small.txt", small)):
+        digests = results[name]["digests"]
+        assert results[name]["size"] == len(data)
+        assert digests["sha256"] == hashlib.sha256(data).hexdigest()
+        assert digests["sha1"] == hashlib.sha1(data).hexdigest()
+        assert digests["md5"] == hashlib.md5(data).hexdigest()
+        assert digests["blake2b"] == hashlib.blake2b(data).hexdigest()
+        assert digests["crc32"] == f"{zlib.crc32(data):08x}"
+
+def test_hash_files_rejects_unknown_algorithm(client: TestClient, auth_headers: dict):
+    response = client.post(
+        "/tools/files/hash?algorithms=sha256,rot13",
+        files=[("files", ("a.txt", b"a"))],
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 400
+    assert "rot13" in response.json()["detail"]
+
+def test_hash_files_requires_file_parts(client: TestClient, auth_headers: dict):
+    response = client.post("/tools/files/hash", data={"note": "no files here"}, files={"other": ("a.txt", b"a")}, headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_hash_files_requires_content_length(client: TestClient, auth_headers: dict):
+    """A chunked body has no declared size to charge usage for."""
+    body = b"--b\r\nContent-Disposition: form-data; name=\"files\"; filename=\"a.txt\"\r\n\r\nabc\r\n--b--\r\n"
+    response = client.post(
+        "/tools/files/hash",
+        content=iter([body]),
+        headers={**auth_headers, "Content-Type": "multipart/form-data; boundary=b"},
+    )
+
+    assert response.status_code == 411
+
+def test_compress_then_decompress_round_trip(client: TestClient, auth_headers: dict):
+    """Every format round-trips through /compress and /decompress."""
+    data = b"utility api " * 50_000
+    for fmt in ("gzip", "zlib", "bz2", "lzma"):
+        compressed = client.post(
+            f"/tools/files/compress?format={fmt}&preset=fast",
+            files={"file": ("data.txt", data)},
+            headers=auth_headers,
+        )
+        assert compressed.status_code == 200
+        assert len(compressed.content) < len(data)
+
+        restored = client.post(
+            f"/tools/files/decompress?format={fmt}",
+            files={"file": ("data.txt", compressed.content)},
+            headers=auth_headers,
+        )
+        assert restored.status_code == 200
+        assert restored.content == data
+
+def test_large_gzip_is_compressed_in_parallel_members(client: TestClient, auth_headers: dict):
+    """Inputs of PARALLEL_GZIP_MIN_BYTES or more become one gzip member per block; gzip reads them as one file."""
+    import gzip
+
+    data = b"utility api " * 500_000  # 6 MB
+    response = client.post("/tools/files/compress?format=gzip&preset=fast", files={"file": ("big.txt", data)}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert gzip.decompress(response.content) == data
+    members, rest = 0, response.content
+    while rest:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decompressor.decompress(rest)
+        rest = decompressor.unused_data
+        members += 1
+    assert members > 1
+
+def test_decompressed_output_is_capped(client: TestClient, auth_headers: dict, monkeypatch):
+    """MAX_DECOMPRESSED_MB guards against decompression bombs."""
+    import gzip
+    import io
+
+    from app.core.compression import decompress_chunks
+    from app.core.config import settings
+
+    bomb = gzip.compress(b"\0" * (3 * 1024 * 1024))
+
+    # Past the cap mid-stream: the output stops there
+    produced = 0
+    with pytest.raises(ValueError):
+        for chunk in decompress_chunks(io.BytesIO(bomb), "gzip", max_output=1024 * 1024):
+            produced += len(chunk)
+    assert produced <= 1024 * 1024
+
+    # Already past it in the first chunk: rejected before the response starts
+    monkeypatch.setattr(settings, "MAX_DECOMPRESSED_MB", 0)
+    response = client.post("/tools/files/decompress?format=gzip", files={"file": ("bomb.gz", bomb)}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_compress_with_base64_encoding(client: TestClient, auth_headers: dict):
+    """Compress-then-encode in one call returns Base64 text of a gzip stream."""
+    import base64
+    import gzip
+
+    data = b"x" * 100_000
+    response = client.post(
+        "/tools/files/compress?format=gzip&encode=base64",
+        files={"file": ("x.bin", data)},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    assert gzip.decompress(base64.b64decode(response.content)) == data
+
+def test_zip_multiple_files(client: TestClient, auth_headers: dict):
+    import io
+    import zipfile
+
+    response = client.post(
+        "/tools/files/zip",
+        files=[("files", ("a.txt", b"first")), ("files", ("a.txt", b"second"))],
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.read("a.txt") == b"first"
+    assert archive.read("a (1).txt") == b"second"
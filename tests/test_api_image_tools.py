@@ -0,0 +1,58 @@
+# tests/test_api_image_tools.py
+
+import io
+from fastapi.testclient import TestClient
+from PIL import Image
+
+def _animated_gif(frames: int = 6) -> bytes:
+    images = [Image.new("RGB", (100, 100), (i * 40, 0, 0)) for i in range(frames)]
+    buffer = io.BytesIO()
+    images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:], duration=100, loop=0)
+    return buffer.getvalue()
+
+def test_resize_keeps_gif_animation(client: TestClient, auth_headers: dict):
+    response = client.post(
+        "/tools/images/resize?width=50&height=40",
+        files={"file": ("anim.gif", _animated_gif(), "image/gif")},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    result = Image.open(io.BytesIO(response.content))
+    assert result.format == "GIF"
+    assert result.size == (50, 40)
+    assert result.n_frames == 6
+
+def test_frame_step_drops_frames_but_keeps_timing(client: TestClient, auth_headers: dict):
+    """Every 2nd frame is kept and shows for twice as long."""
+    response = client.post(
+        "/tools/images/resize?width=50&height=50&frame_step=2",
+        files={"file": ("anim.gif", _animated_gif(), "image/gif")},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    result = Image.open(io.BytesIO(response.content))
+    assert result.n_frames == 3
+    assert result.info["duration"] == 200
+
+def test_output_size_must_be_positive_and_bounded(client: TestClient, auth_headers: dict):
+    """Usage is charged for the requested size, so a negative one must never reach the meter."""
+    files = {"file": ("anim.gif", _animated_gif(), "image/gif")}
+    for query in ("resize?width=-100000&height=1000", "resize?width=100000&height=10", "upscale?scale_factor=-3", "upscale?scale_factor=1000"):
+        assert client.post(f"/tools/images/{query}", files=files, headers=auth_headers).status_code == 422
+
+def test_oversized_output_is_rejected_before_processing(client: TestClient, auth_headers: dict, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "MAX_OUTPUT_MEGAPIXELS", 1)
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 800), "blue").save(buffer, format="PNG")
+
+    response = client.post(
+        "/tools/images/upscale?scale_factor=2",
+        files={"file": ("big.png", buffer.getvalue(), "image/png")},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,18 @@
+# tests/test_bloom.py
+
+from app.core.bloom import BloomFilter
+
+def test_no_false_negatives():
+    items = [f"session-{i}" for i in range(5_000)]
+    bloom = BloomFilter.from_items(items, capacity=5_000)
+
+    assert all(item in bloom for item in items)
+    assert bloom.count == 5_000
+
+def test_false_positive_rate_is_near_target():
+    bloom = BloomFilter.from_items((f"revoked-{i}" for i in range(10_000)), capacity=10_000, error_rate=0.01)
+
+    false_positives = sum(f"active-{i}" in bloom for i in range(20_000))
+
+    # Expected around 200; allow generous slack for the hash distribution
+    assert false_positives < 400
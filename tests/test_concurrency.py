@@ -0,0 +1,89 @@
+# tests/test_concurrency.py
+
+import asyncio
+import pytest
+from app.core.concurrency import AdaptiveLimiter, LimiterConfig
+
+def _config(**overrides) -> LimiterConfig:
+    values = dict(initial_limit=2, min_limit=1, max_limit=8, max_queue=1, queue_timeout=0.2, target_latency=0.05)
+    values.update(overrides)
+    return LimiterConfig(**values)
+
+@pytest.mark.asyncio
+async def test_requests_beyond_limit_and_queue_are_shed():
+    limiter = AdaptiveLimiter("test_shed", _config())
+
+    assert await limiter.acquire()
+    assert await limiter.acquire()
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    # Limit reached and the single queue slot is taken
+    assert not await limiter.acquire()
+
+    limiter.release(0.01)
+    assert await queued
+    assert limiter.in_flight == 2
+
+@pytest.mark.asyncio
+async def test_slow_responses_shrink_the_limit():
+    limiter = AdaptiveLimiter("test_backoff", _config(initial_limit=4))
+
+    assert await limiter.acquire()
+    limiter.release(1.0)
+
+    assert limiter.limit < 4
+
+def test_shed_requests_get_503_with_retry_after():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.middleware import ConcurrencyLimitMiddleware
+
+    limiter = AdaptiveLimiter("test_http", _config(initial_limit=1, max_queue=0))
+    limiter.in_flight = 1  # simulate a saturated class
+    app = FastAPI()
+    app.add_middleware(ConcurrencyLimitMiddleware, route_classes={"/tools/images": "image"}, limiters={"image": limiter})
+
+    @app.get("/tools/images/ping")
+    def ping():
+        return {"ok": True}
+
+    @app.get("/status/ping")
+    def status_ping():
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        response = client.get("/tools/images/ping")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        # Other route classes are unaffected
+        assert client.get("/status/ping").status_code == 200
+
+@pytest.mark.asyncio
+async def test_slow_request_bodies_do_not_count_as_latency():
+    """A client trickling its upload must not make the backend look slow."""
+    from app.core.middleware import ConcurrencyLimitMiddleware
+
+    limiter = AdaptiveLimiter("test_upload", _config())
+    observed = []
+    release = limiter.release
+    limiter.release = lambda latency: (observed.append(latency), release(latency))
+
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    chunks = [{"type": "http.request", "body": b"x", "more_body": more} for more in (True, True, False)]
+
+    async def slow_receive():
+        await asyncio.sleep(0.1)
+        return chunks.pop(0)
+
+    async def send(message):
+        pass
+
+    middleware = ConcurrencyLimitMiddleware(app, route_classes={"/tools/uploads": "file"}, limiters={"file": limiter})
+    await middleware({"type": "http", "path": "/tools/uploads/x"}, slow_receive, send)
+
+    assert observed[0] < 0.05
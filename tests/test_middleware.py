@@ -0,0 +1,48 @@
+# tests/test_middleware.py
+
+from fastapi.testclient import TestClient
+from app.core.middleware import negotiate_encoding
+
+def test_negotiate_encoding_respects_q_values():
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("*") is not None
+
+def test_base64_response_is_gzip_compressed(client: TestClient, auth_headers: dict):
+    """Large JSON bodies are compressed when the client accepts gzip."""
+    data = b"A" * 200_000
+    response = client.post(
+        "/tools/files/to-base64",
+        files={"file": ("a.txt", data)},
+        headers={**auth_headers, "Accept-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    # httpx transparently decodes, so the payload is still usable as-is
+    assert response.json()["filename"] == "a.txt"
+    assert response.num_bytes_downloaded < len(response.content)
+
+def test_image_responses_are_not_recompressed(client: TestClient, auth_headers: dict):
+    import io
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 300), "blue").save(buffer, format="PNG")
+    response = client.post(
+        "/tools/images/resize?width=200&height=200",
+        files={"file": ("blue.png", buffer.getvalue(), "image/png")},
+        headers={**auth_headers, "Accept-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+def test_cors_wraps_the_other_middleware():
+    """Shed (503) and oversized upload (413) responses must carry CORS headers too."""
+    from fastapi.middleware.cors import CORSMiddleware
+    from app.main import app
+
+    assert app.user_middleware[0].cls is CORSMiddleware
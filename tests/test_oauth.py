@@ -0,0 +1,133 @@
+# tests/test_oauth.py
+
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+import rsa
+from fastapi.testclient import TestClient
+from jose import jwk, jwt
+
+from app.api.auth import get_google_provider
+from app.core import oauth
+from app.core.config import settings
+from app.main import app
+
+class StubProvider:
+    """Minimal local OpenID Connect provider, served through httpx.MockTransport."""
+
+    ISSUER = "https://idp.example.test"
+    CLIENT_ID = "test-client-id"
+
+    def __init__(self):
+        self.requests = Counter()
+        self.keys = {}
+        self.codes = {}
+        self.add_key("key-1")
+
+    def add_key(self, kid: str) -> None:
+        public, private = rsa.newkeys(1024)
+        public_jwk = jwk.construct(public.save_pkcs1().decode(), "RS256").to_dict()
+        self.keys[kid] = (private.save_pkcs1().decode(), {**public_jwk, "kid": kid, "use": "sig"})
+
+    def issue_code(self, code: str, nonce: str, kid: str = "key-1", **claims) -> None:
+        now = int(time.time())
+        claims = {"iss": self.ISSUER, "aud": self.CLIENT_ID, "sub": "1234", "iat": now, "exp": now + 300, "nonce": nonce, **claims}
+        self.codes[code] = jwt.encode(claims, self.keys[kid][0], algorithm="RS256", headers={"kid": kid})
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests[request.url.path] += 1
+        if request.url.path == "/.well-known/openid-configuration":
+            return httpx.Response(200, json={
+                "issuer": self.ISSUER,
+                "authorization_endpoint": f"{self.ISSUER}/authorize",
+                "token_endpoint": f"{self.ISSUER}/token",
+                "jwks_uri": f"{self.ISSUER}/jwks",
+            }, headers={"Cache-Control": "public, max-age=3600"})
+        if request.url.path == "/jwks":
+            return httpx.Response(200, json={"keys": [public for _, public in self.keys.values()]})
+        if request.url.path == "/token":
+            code = parse_qs(request.content.decode())["code"][0]
+            if code not in self.codes:
+                return httpx.Response(400, json={"error": "invalid_grant"})
+            return httpx.Response(200, json={"id_token": self.codes.pop(code), "token_type": "Bearer"})
+        return httpx.Response(404)
+
+@pytest.fixture
+def stub() -> StubProvider:
+    return StubProvider()
+
+@pytest.fixture
+def sso_client(test_db_session, stub: StubProvider, monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_DISCOVERY_URL", f"{StubProvider.ISSUER}/.well-known/openid-configuration")
+    monkeypatch.setattr(settings, "GOOGLE_CLIENT_ID", StubProvider.CLIENT_ID)
+    get_google_provider.cache_clear()
+    # The lifespan keeps an existing client, so the app talks to the stub
+    oauth._http_client = httpx.AsyncClient(transport=httpx.MockTransport(stub.handle))
+    with TestClient(app) as c:
+        yield c
+    get_google_provider.cache_clear()
+
+def _start_login(client: TestClient) -> dict:
+    response = client.get("/auth/google/login", follow_redirects=False)
+    assert response.status_code == 307
+    return {key: values[0] for key, values in parse_qs(urlparse(response.headers["location"]).query).items()}
+
+def test_google_login_round_trip(sso_client: TestClient, stub: StubProvider):
+    """Code exchange + local ID token verification; discovery and keys are fetched once."""
+    for code in ("code-1", "code-2"):
+        params = _start_login(sso_client)
+        assert params["client_id"] == StubProvider.CLIENT_ID
+        stub.issue_code(code, params["nonce"], email="sso-user@example.com", email_verified=True)
+
+        response = sso_client.get(f"/auth/google/callback?code={code}&state={params['state']}")
+
+        assert response.status_code == 200, response.text
+        assert response.json()["token_type"] == "bearer"
+
+    assert stub.requests["/.well-known/openid-configuration"] == 1
+    assert stub.requests["/jwks"] == 1
+    assert stub.requests["/token"] == 2
+
+def test_callback_rejects_wrong_state_and_nonce(sso_client: TestClient, stub: StubProvider):
+    params = _start_login(sso_client)
+    stub.issue_code("code-1", params["nonce"], email="sso-user@example.com")
+    assert sso_client.get("/auth/google/callback?code=code-1&state=forged").status_code == 400
+
+    params = _start_login(sso_client)
+    stub.issue_code("code-2", "some-other-nonce", email="sso-user@example.com")
+    assert sso_client.get(f"/auth/google/callback?code=code-2&state={params['state']}").status_code == 400
+
+def test_callback_requires_verified_email(sso_client: TestClient, stub: StubProvider):
+    """Without email_verified=true the token cannot sign anyone in by email."""
+    for code, claims in (("code-1", {}), ("code-2", {"email_verified": False})):
+        params = _start_login(sso_client)
+        stub.issue_code(code, params["nonce"], email="sso-user@example.com", **claims)
+        assert sso_client.get(f"/auth/google/callback?code={code}&state={params['state']}").status_code == 400
+
+@pytest.mark.asyncio
+async def test_unknown_key_id_forces_one_jwks_refresh(stub: StubProvider):
+    """A rotated signing key is picked up by refetching the JWKS; repeated misses are rate limited."""
+    oauth._http_client = httpx.AsyncClient(transport=httpx.MockTransport(stub.handle))
+    provider = oauth.OIDCProvider(
+        f"{StubProvider.ISSUER}/.well-known/openid-configuration", StubProvider.CLIENT_ID, "secret", "http://testserver/cb", 3600
+    )
+    try:
+        stub.issue_code("first", "n1")
+        await provider.verify_id_token(stub.codes.pop("first"), "n1")
+
+        stub.add_key("key-2")
+        stub.issue_code("rotated", "n2", kid="key-2")
+        claims = await provider.verify_id_token(stub.codes.pop("rotated"), "n2")
+        assert claims["nonce"] == "n2"
+        assert stub.requests["/jwks"] == 2
+
+        stub.add_key("key-3")
+        stub.issue_code("again", "n3", kid="key-3")
+        with pytest.raises(oauth.OAuthError):
+            await provider.verify_id_token(stub.codes.pop("again"), "n3")
+        assert stub.requests["/jwks"] == 2
+    finally:
+        await oauth.close_http_client()
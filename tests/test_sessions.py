@@ -0,0 +1,65 @@
+# tests/test_sessions.py
+
+from fastapi.testclient import TestClient
+
+from app.core.sessions import RevocationFilter
+
+def login(client: TestClient) -> dict:
+    email, password = "session-user@example.com", "securepassword123"
+    client.post("/auth/basic/register", json={"email": email, "password": password})
+    response = client.post(f"/auth/basic/token?username={email}&password={password}")
+    assert response.status_code == 200
+    return response.json()
+
+def test_login_returns_refresh_token(client: TestClient):
+    tokens = login(client)
+
+    assert tokens["refresh_token"]
+    assert tokens["expires_in"] > 0
+
+def test_refresh_rotates_the_token_pair(client: TestClient):
+    tokens = login(client)
+
+    response = client.post("/auth/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert refreshed["access_token"] != tokens["access_token"]
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+    response = client.post("/tools/files/to-base64", files={"file": ("a.txt", b"hello")}, headers=headers)
+    assert response.status_code == 200
+
+def test_reused_refresh_token_revokes_the_session(client: TestClient):
+    tokens = login(client)
+    refreshed = client.post("/auth/token/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    reuse = client.post("/auth/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+    assert reuse.status_code == 401
+    # The legitimate holder's tokens die with the session too
+    assert client.post("/auth/token/refresh", json={"refresh_token": refreshed["refresh_token"]}).status_code == 401
+    headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+    assert client.post("/auth/logout", headers=headers).status_code == 401
+
+def test_logout_revokes_access_and_refresh_tokens(client: TestClient):
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+
+    response = client.post("/tools/files/to-base64", files={"file": ("a.txt", b"hello")}, headers=headers)
+    assert response.status_code == 401
+    assert client.post("/auth/token/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+def test_malformed_refresh_token_is_rejected(client: TestClient):
+    assert client.post("/auth/token/refresh", json={"refresh_token": "not-a-token"}).status_code == 401
+
+def test_revocation_echo_is_not_counted_twice():
+    """A worker sees its own revocations again through pub/sub; they must not fill the filter twice."""
+    revoked = RevocationFilter()
+    revoked.synced = True
+    revoked.add("sid-1")
+    revoked.add("sid-1")
+    assert revoked._bloom.count == 1
+    assert revoked.synced
@@ -0,0 +1,127 @@
+# tests/test_shm.py
+
+import gc
+import io
+
+import pytest
+from PIL import Image
+
+from app.core import image_workers, metrics
+from app.core.config import settings
+from app.core.shm import MIN_SEGMENT_SIZE, SegmentFile, SegmentFull, SegmentPool, attach_pixels, share_pixels, size_class
+from app.core.uploads import SpooledUpload
+
+@pytest.fixture
+def pool():
+    pool = SegmentPool(max_idle_bytes=16 * 1024 * 1024)
+    yield pool
+    pool.close()
+
+def test_size_classes_are_powers_of_two():
+    assert size_class(1) == MIN_SEGMENT_SIZE
+    assert size_class(MIN_SEGMENT_SIZE + 1) == 2 * MIN_SEGMENT_SIZE
+    assert size_class(3 * 1024 * 1024) == 4 * 1024 * 1024
+
+def test_released_segments_are_reused(pool):
+    with pool.lease(1000) as first:
+        name = first.name
+    with pool.lease(2000) as second:
+        assert second.name == name
+    assert pool.stats() == {"leased": 0, "idle_segments": 1, "idle_bytes": MIN_SEGMENT_SIZE}
+
+def test_segment_is_kept_until_the_last_reference_is_released(pool):
+    lease = pool.lease(10)
+    lease.retain()
+    lease.release()
+    assert pool.stats()["leased"] == 1
+    lease.write(b"still mine")
+    lease.release()
+    assert pool.stats()["leased"] == 0
+    with pytest.raises(ValueError):
+        lease.write(b"too late")
+
+def test_leaked_lease_is_reported_and_reclaimed(pool):
+    before = metrics.snapshot()["counters"].get("shm_leases_leaked", 0)
+    pool.lease(10)  # Never released
+    gc.collect()
+
+    assert metrics.snapshot()["counters"]["shm_leases_leaked"] == before + 1
+    assert pool.stats()["leased"] == 0
+
+def test_pillow_encodes_into_and_decodes_from_a_segment(pool):
+    with pool.lease(1024 * 1024) as lease:
+        out = SegmentFile(lease.buf)
+        Image.new("RGB", (64, 32), "red").save(out, format="PNG")
+        size = out.size
+        out.close()
+
+        with Image.open(SegmentFile(lease.buf, size)) as image:
+            assert image.size == (64, 32)
+            assert image.getpixel((0, 0)) == (255, 0, 0)
+
+def test_writing_past_the_segment_raises(pool):
+    with pool.lease(10) as lease:
+        out = SegmentFile(lease.buf[:10])
+        out.write(b"0123456789")
+        with pytest.raises(SegmentFull):
+            out.write(b"x")
+
+def test_shared_pixels_are_mapped_without_copying(pool):
+    lease, spec = share_pixels(pool, Image.new("RGB", (8, 4), (1, 2, 3)))
+    with lease:
+        image = attach_pixels(lease.buf, spec)
+        assert spec.mode == "RGBX"
+        assert image.getpixel((7, 3))[:3] == (1, 2, 3)
+        # Same memory: a change to the segment shows in the image
+        lease.buf[0] = 9
+        assert image.getpixel((0, 0))[0] == 9
+        del image
+
+def test_palette_images_keep_their_colours(pool):
+    """The palette is not in the pixel buffer, so P/PA/LA images are expanded before sharing."""
+    red = Image.new("RGB", (4, 4), (255, 0, 0))
+    for image in (red.convert("P"), red.convert("P").convert("PA"), Image.new("LA", (4, 4), (200, 128))):
+        lease, spec = share_pixels(pool, image)
+        with lease:
+            shared = attach_pixels(lease.buf, spec)
+            assert shared.convert("RGBA").getpixel((0, 0)) == image.convert("RGBA").getpixel((0, 0))
+            del shared
+
+def test_image_process_unmaps_segments_beyond_the_idle_cap(pool, monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_SHM_MAX_IDLE_MB", 1)
+    monkeypatch.setattr(image_workers, "_attached", type(image_workers._attached)())
+    monkeypatch.setattr(image_workers, "_attached_bytes", 0)
+    leases = [pool.lease(512 * 1024) for _ in range(3)]
+    try:
+        for lease in leases:
+            image_workers._attach(lease.name)
+        image_workers._detach_idle()
+        # The oldest one went over the cap; the two most recent stay mapped for reuse
+        assert list(image_workers._attached) == [lease.name for lease in leases[1:]]
+        assert image_workers._attached_bytes == 1024 * 1024
+    finally:
+        monkeypatch.setattr(settings, "IMAGE_SHM_MAX_IDLE_MB", 0)
+        image_workers._detach_idle()
+        for lease in leases:
+            lease.release()
+
+@pytest.mark.asyncio
+async def test_image_process_round_trip(monkeypatch):
+    from app.api.image_tools import resize_image
+
+    monkeypatch.setattr(settings, "IMAGE_PROCESS_WORKERS", 1)
+    data = io.BytesIO()
+    Image.new("RGB", (200, 100), "blue").save(data, format="JPEG")
+    upload = SpooledUpload("a.jpg", "image/jpeg", 1024 * 1024)
+    upload.write(data.getvalue())
+
+    try:
+        with upload:
+            result = await image_workers.run_in_image_process(resize_image, upload, 50 * 25 * 4, 50, 25, 80, 1)
+            # Far too small an output segment: the result comes back through the pipe instead
+            spilled = await image_workers.run_in_image_process(resize_image, upload, 1, 50, 25, 80, 1)
+    finally:
+        image_workers.shutdown_image_workers()
+
+    assert Image.open(io.BytesIO(result)).size == (50, 25)
+    assert Image.open(io.BytesIO(spilled)).size == (50, 25)
@@ -0,0 +1,81 @@
+# tests/test_singleflight.py
+
+import asyncio
+import uuid
+import pytest
+from app.core import metrics, singleflight
+from app.core.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_execution():
+    """Ten identical concurrent calls run the work once; nine are counted as coalesced."""
+    singleflight._binary_redis = None  # bind a fresh client to this test's event loop
+    flight = SingleFlight(f"test_{uuid.uuid4().hex[:8]}")
+    calls = 0
+
+    async def work() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"encoded-image"
+
+    results = await asyncio.gather(*(flight.do("same-key", work) for _ in range(10)))
+
+    assert results == [b"encoded-image"] * 10
+    assert calls == 1
+    assert metrics.snapshot()["counters"][f"singleflight_{flight.name}_coalesced"] == 9
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters():
+    singleflight._binary_redis = None
+    flight = SingleFlight(f"test_{uuid.uuid4().hex[:8]}")
+
+    async def failing_work() -> bytes:
+        await asyncio.sleep(0.01)
+        raise ValueError("cannot decode image")
+
+    results = await asyncio.gather(*(flight.do("bad", failing_work) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_waiting_duplicates():
+    """A client disconnecting mid-flight must not fail the duplicates that joined it."""
+    singleflight._binary_redis = None
+    flight = SingleFlight(f"test_{uuid.uuid4().hex[:8]}")
+
+    async def work() -> bytes:
+        await asyncio.sleep(0.1)
+        return b"encoded-image"
+
+    leader = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0.01)
+    duplicate = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await duplicate == b"encoded-image"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_when_no_caller_is_left():
+    singleflight._binary_redis = None
+    flight = SingleFlight(f"test_{uuid.uuid4().hex[:8]}")
+    finished = False
+
+    async def work() -> bytes:
+        nonlocal finished
+        await asyncio.sleep(0.2)
+        finished = True
+        return b"unused"
+
+    caller = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    await asyncio.sleep(0.3)
+
+    assert not finished
+    assert not flight._inflight
@@ -0,0 +1,24 @@
+# tests/test_startup.py
+
+import subprocess
+import sys
+
+# Dependencies that are imported on first use only (see benchmarks/bench_startup.py)
+LAZY_MODULES = ["PIL", "passlib", "jose", "httpx"]
+
+def test_import_app_main_skips_heavy_dependencies():
+    """Importing the app must not pull in Pillow, passlib, python-jose or httpx."""
+    code = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "", f"Imported eagerly: {result.stdout.strip()}"
+
+def test_engine_is_created_in_lifespan(client):
+    """The engine only exists once the app has started (TestClient runs the lifespan)."""
+    from app.db import database
+
+    assert database.engine is not None
@@ -0,0 +1,101 @@
+# tests/test_uploads.py
+
+import mmap
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.uploads import MB, SpooledUpload
+
+def test_spooled_upload_stays_in_memory_below_limit():
+    """Small uploads are served from memory through a memoryview."""
+    with SpooledUpload("small.txt", "text/plain", spool_max_size=1024) as upload:
+        upload.write(b"hello ")
+        upload.write(b"world")
+
+        assert not upload.on_disk
+        view = upload.view()
+        assert isinstance(view, memoryview)
+        assert bytes(view) == b"hello world"
+        assert upload.open().read() == b"hello world"
+
+def test_spooled_upload_rolls_over_to_mmap():
+    """Uploads above the spool limit move to disk and are exposed as an mmap."""
+    with SpooledUpload("big.bin", "application/octet-stream", spool_max_size=1024) as upload:
+        upload.write(b"a" * 1000)
+        upload.write(b"b" * 1000)
+
+        assert upload.on_disk
+        assert upload.size == 2000
+        view = upload.view()
+        assert isinstance(view, mmap.mmap)
+        assert view[:1000] == b"a" * 1000 and view[1000:] == b"b" * 1000
+
+def test_oversized_upload_rejected_before_reading_body(client: TestClient):
+    """Content-Length above the route limit gets 413 before auth or body parsing."""
+    too_big = settings.MAX_IMAGE_UPLOAD_MB * MB + 1
+    response = client.post(
+        "/tools/images/resize",
+        content=b"",
+        headers={"Content-Length": str(too_big), "Content-Type": "multipart/form-data; boundary=x"},
+    )
+
+    assert response.status_code == 413
+
+def test_resumable_upload_round_trip(client: TestClient, auth_headers: dict):
+    """Create, send two chunks, recover the offset, then finalize into Base64."""
+    import base64
+    import hashlib
+
+    data = b"0123456789" * 1000
+    create = client.post(
+        "/tools/uploads", json={"filename": "digits.txt", "length": len(data)}, headers=auth_headers
+    )
+    assert create.status_code == 201
+    upload_url = create.headers["Location"]
+
+    first = data[:4000]
+    checksum = "sha256 " + base64.b64encode(hashlib.sha256(first).digest()).decode()
+    response = client.patch(
+        upload_url, content=first, headers={**auth_headers, "Upload-Offset": "0", "Upload-Checksum": checksum}
+    )
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == "4000"
+
+    # A client that lost its connection asks where to resume
+    response = client.head(upload_url, headers=auth_headers)
+    assert response.headers["Upload-Offset"] == "4000"
+
+    # Wrong offsets are rejected rather than corrupting the file
+    response = client.patch(upload_url, content=data[4000:], headers={**auth_headers, "Upload-Offset": "10"})
+    assert response.status_code == 409
+
+    response = client.patch(upload_url, content=data[4000:], headers={**auth_headers, "Upload-Offset": "4000"})
+    assert response.headers["Upload-Offset"] == str(len(data))
+
+    response = client.post(f"{upload_url}/to-base64", headers=auth_headers)
+    assert response.status_code == 200
+    assert base64.b64decode(response.json()["base64_string"]) == data
+
+def test_resumable_upload_rejects_bad_checksum(client: TestClient, auth_headers: dict):
+    create = client.post("/tools/uploads", json={"filename": "a.bin", "length": 10}, headers=auth_headers)
+    upload_url = create.headers["Location"]
+
+    response = client.patch(
+        upload_url,
+        content=b"x" * 10,
+        headers={**auth_headers, "Upload-Offset": "0", "Upload-Checksum": "md5 AAAAAAAAAAAAAAAAAAAAAA=="},
+    )
+
+    assert response.status_code == 460
+    assert client.head(upload_url, headers=auth_headers).headers["Upload-Offset"] == "0"
+
+def test_base64_finalizer_is_capped_like_to_base64(client: TestClient, auth_headers: dict, monkeypatch):
+    """Base64 output is built in memory, so large resumable uploads are refused."""
+    monkeypatch.setattr(settings, "MAX_FILE_UPLOAD_MB", 1)
+    data = b"x" * (MB + 1)
+    create = client.post("/tools/uploads", json={"filename": "big.bin", "length": len(data)}, headers=auth_headers)
+    upload_url = create.headers["Location"]
+    client.patch(upload_url, content=data, headers={**auth_headers, "Upload-Offset": "0"})
+
+    response = client.post(f"{upload_url}/to-base64", headers=auth_headers)
+
+    assert response.status_code == 413
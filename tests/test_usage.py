@@ -0,0 +1,64 @@
+# tests/test_usage.py
+
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+
+def test_daily_byte_quota_returns_429(client: TestClient, auth_headers: dict, monkeypatch):
+    """Usage is counted in Redis; the request that would cross the quota is rejected."""
+    monkeypatch.setattr(settings, "USAGE_DAILY_BYTES_QUOTA_MB", 1)
+    data = b"x" * 600_000
+
+    first = client.post("/tools/files/to-base64", files={"file": ("a.bin", data)}, headers=auth_headers)
+    second = client.post("/tools/files/to-base64", files={"file": ("b.bin", data)}, headers=auth_headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert int(second.headers["retry-after"]) > 0
+
+def test_rejected_requests_do_not_use_up_the_quota(client: TestClient, auth_headers: dict, monkeypatch):
+    monkeypatch.setattr(settings, "USAGE_DAILY_BYTES_QUOTA_MB", 1)
+
+    too_big = client.post("/tools/files/to-base64", files={"file": ("big.bin", b"x" * 1_100_000)}, headers=auth_headers)
+    small = client.post("/tools/files/to-base64", files={"file": ("small.bin", b"x" * 500_000)}, headers=auth_headers)
+
+    assert too_big.status_code == 429
+    assert small.status_code == 200
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_entries_dirty(monkeypatch):
+    """Entries leave the dirty set only once their totals are committed to Postgres."""
+    import redis.asyncio as redis
+    from app.core import usage
+
+    redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    user_id = f"flush-test-{uuid.uuid4().hex}"
+    await usage.UsageMeter(redis_client, user_id).charge(bytes_processed=100)
+    entry = f"{user_id}:{usage._today().isoformat()}"
+
+    def failing_upsert(rows):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(usage, "_upsert_usage", failing_upsert)
+    with pytest.raises(RuntimeError):
+        await usage.flush_usage(redis_client)
+    assert await redis_client.sismember(usage.DIRTY_KEY, entry)
+
+    written = []
+    monkeypatch.setattr(usage, "_upsert_usage", written.extend)
+    await usage.flush_usage(redis_client)
+    assert not await redis_client.sismember(usage.DIRTY_KEY, entry)
+    assert any(row["user_id"] == user_id and row["bytes_processed"] == 100 for row in written)
+    await redis_client.aclose()
+
+@pytest.mark.asyncio
+async def test_negative_usage_is_rejected():
+    """A negative charge would lower the day's totals and free up quota."""
+    from app.core import usage
+
+    meter = usage.UsageMeter(redis_client=None, user_id="negative-test")
+    with pytest.raises(ValueError):
+        await meter.charge(pixels=-1)
+    with pytest.raises(ValueError):
+        await meter.charge(bytes_processed=-1)